@@ -0,0 +1,24 @@
+"""
+Normalized addresses for the geocoder cache keys and the local geocoder
+index, so both see the same address the same way.
+"""
+import re
+
+# слова, без которых адрес остается тем же адресом
+STOP_WORDS = {
+    'беларусь', 'минск', 'мінск', 'г', 'город', 'горад',
+    'улица', 'ул', 'вуліца', 'вул',
+    'проспект', 'пр', 'праспект',
+    'переулок', 'пер', 'завулак', 'зав',
+    'дом', 'д',
+}
+
+
+def normalize_address(address: str, drop_stop_words: bool = False) -> str:
+    address = address.lower().replace('ё', 'е')
+    words = re.findall(r'\w+', address)
+
+    if drop_stop_words:
+        words = [word for word in words if word not in STOP_WORDS]
+
+    return ' '.join(words)
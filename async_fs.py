@@ -0,0 +1,64 @@
+"""
+Filesystem operations run in the default executor, so a slow volume
+doesn't stall the event loop.
+"""
+import asyncio
+import functools
+import os
+import shutil
+from typing import Any, Callable, List
+
+
+async def _run(func: Callable, *args, **kwargs) -> Any:
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None,
+                                      functools.partial(func, *args, **kwargs))
+
+
+async def makedirs(path: str, exist_ok: bool = True) -> None:
+    await _run(os.makedirs, path, exist_ok=exist_ok)
+
+
+async def rename(source: str, target: str) -> None:
+    await _run(os.rename, source, target)
+
+
+async def link(source: str, target: str) -> None:
+    await _run(os.link, source, target)
+
+
+async def remove(path: str) -> None:
+    try:
+        await _run(os.remove, path)
+    except FileNotFoundError:
+        pass
+
+
+async def listdir(path: str) -> List[str]:
+    return await _run(os.listdir, path)
+
+
+async def read_bytes(path: str) -> bytes:
+    return await _run(_read_bytes, path)
+
+
+async def write_bytes(path: str, data: bytes) -> None:
+    await _run(_write_bytes, path, data)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with open(path, 'wb') as file:
+        file.write(data)
+
+
+async def exists(path: str) -> bool:
+    return await _run(os.path.exists, path)
+
+
+async def rmtree(path: str) -> None:
+    await _run(shutil.rmtree, path, ignore_errors=True)
@@ -0,0 +1,119 @@
+"""
+Photo pipeline requests per second against a local stub server: every
+photo is downloaded, uploaded and sent to the recognizer. Fresh
+ClientSession per request (as it was) against the pooled http_client.
+
+    python -m benchmarks.http_pipeline
+"""
+import asyncio
+import time
+
+import aiohttp
+from aiohttp import web
+
+import http_client
+
+PHOTOS = 300
+CONCURRENCY = 30
+PHOTO_SIZE = 200 * 1024
+HOST = '127.0.0.1'
+PORT = 18765
+BASE_URL = f'http://{HOST}:{PORT}'
+
+
+async def photo(request: web.Request) -> web.Response:
+    return web.Response(body=b'\xff' * PHOTO_SIZE, content_type='image/jpeg')
+
+
+async def upload(request: web.Request) -> web.Response:
+    await request.read()
+    return web.json_response([{'src': '/file/uploaded.jpg'}])
+
+
+async def recognize(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response({'data': ['1234AB7']})
+
+
+async def start_stub() -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get('/file/{name}', photo)
+    app.router.add_post('/upload', upload)
+    app.router.add_post('/recognize', recognize)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    return runner
+
+
+async def process(number: int, get_session) -> None:
+    async with get_session(http_client.TELEGRAM) as http_session:
+        async with http_session.get(f'{BASE_URL}/file/{number}.jpg') as resp:
+            raw_file = await resp.read()
+
+    form = aiohttp.FormData()
+    form.add_field('file', raw_file, filename='file')
+
+    async with get_session(http_client.TELEGRAPH) as http_session:
+        async with http_session.post(f'{BASE_URL}/upload', data=form) as resp:
+            await resp.json()
+
+    async with get_session(http_client.RECOGNIZER) as http_session:
+        async with http_session.post(f'{BASE_URL}/recognize',
+                                     json={'path': str(number)}) as resp:
+            await resp.json()
+
+
+class Fresh:
+    """Session per request, closed right after it."""
+    def __init__(self, name: str):
+        self.http_session = aiohttp.ClientSession()
+
+    async def __aenter__(self):
+        return self.http_session
+
+    async def __aexit__(self, *args):
+        await self.http_session.close()
+
+
+class Pooled:
+    def __init__(self, name: str):
+        self.http_session = http_client.session(name)
+
+    async def __aenter__(self):
+        return self.http_session
+
+    async def __aexit__(self, *args):
+        pass
+
+
+async def measure(name: str, get_session) -> None:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def limited(number: int):
+        async with semaphore:
+            await process(number, get_session)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(number) for number in range(PHOTOS)))
+    elapsed = time.perf_counter() - started
+
+    print(f'{name:>8}: {PHOTOS / elapsed:8.1f} photos/s, ' +
+          f'{3 * PHOTOS / elapsed:8.1f} requests/s')
+
+
+async def main():
+    runner = await start_stub()
+
+    try:
+        await measure('fresh', Fresh)
+        await http_client.create()
+        await measure('pooled', Pooled)
+    finally:
+        await http_client.close()
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
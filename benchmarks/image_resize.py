@@ -0,0 +1,73 @@
+"""
+Bytes saved by the downscaling stage on synthetic street-like photos of
+the sizes telegram gives (the largest PhotoSize), and the time it takes.
+
+    python -m benchmarks.image_resize
+"""
+import io
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageDraw, ImageFilter
+
+import config
+from image_resizer import downscale
+
+SIZES = ((1280, 960), (2560, 1920), (4032, 3024))
+PHOTOS = 8
+
+
+def photo(width: int, height: int, seed: int) -> bytes:
+    """
+    Smooth background with blurred shapes and a bit of sensor noise,
+    saved the way phones do it.
+    """
+    random.seed(seed)
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+
+    for _ in range(60):
+        x, y = random.randrange(width), random.randrange(height)
+        size = random.randrange(width // 40, width // 6)
+        color = tuple(random.randrange(256) for _ in range(3))
+        draw.rectangle((x, y, x + size, y + size // 2), fill=color)
+
+    image = image.filter(ImageFilter.GaussianBlur(2))
+    noise = Image.effect_noise((width, height), 12).convert('RGB')
+    image = Image.blend(image, noise, 0.08)
+
+    result = io.BytesIO()
+    image.save(result, 'JPEG', quality=92)
+    return result.getvalue()
+
+
+def main() -> None:
+    with ProcessPoolExecutor(config.IMAGE_RESIZE_WORKERS) as pool:
+        for width, height in SIZES:
+            originals = [photo(width, height, seed) for seed in range(PHOTOS)]
+
+            for name, max_side, quality in (
+                    ('upload', config.PHOTO_MAX_SIDE, config.PHOTO_QUALITY),
+                    ('recognition',
+                     config.RECOGNITION_PHOTO_MAX_SIDE,
+                     config.RECOGNITION_PHOTO_QUALITY)):
+                started = time.perf_counter()
+
+                results = [sizes[0] for sizes in pool.map(
+                    downscale,
+                    originals,
+                    [[(max_side, quality)]] * PHOTOS)]
+
+                spent = (time.perf_counter() - started) / PHOTOS
+                before = sum(map(len, originals)) / PHOTOS / 1024
+                after = sum(map(len, results)) / PHOTOS / 1024
+
+                print(f'{width}x{height} {name:>11}: '
+                      f'{before:7.0f} KB -> {after:6.0f} KB '
+                      f'({100 - after / before * 100:4.1f}% saved), '
+                      f'{spent * 1000:5.1f} ms per photo')
+
+
+if __name__ == '__main__':
+    main()
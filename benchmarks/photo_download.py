@@ -0,0 +1,118 @@
+"""
+Peak RSS and event loop lag of 100 parallel photo downloads from a local
+stub: the whole file read into memory and written with a blocking call
+(as it was) against the streaming PhotoManager._save_photo_to_disk.
+
+    python -m benchmarks.photo_download
+"""
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+
+import config
+
+DOWNLOADS = 100
+PHOTO_SIZE = 2 * 1024 * 1024
+CHUNK = 64 * 1024
+HOST = '127.0.0.1'
+PORT = 18766
+BASE_URL = f'http://{HOST}:{PORT}'
+TICK = 0.005
+
+
+async def photo(request: web.Request) -> web.StreamResponse:
+    response = web.StreamResponse()
+    response.content_length = PHOTO_SIZE
+    await response.prepare(request)
+
+    for _ in range(PHOTO_SIZE // CHUNK):
+        await response.write(b'\xff' * CHUNK)
+
+    return response
+
+
+async def serve() -> None:
+    app = web.Application()
+    app.router.add_get('/file/{name}', photo)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+
+    for mode in ('in_memory', 'streaming'):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'benchmarks.photo_download', mode,
+            stdout=subprocess.PIPE)
+
+        output, _ = await process.communicate()
+        print(output.decode().strip())
+
+    await runner.cleanup()
+
+
+async def in_memory(http_session, file_path: str, url: str) -> None:
+    async with http_session.get(url) as resp:
+        raw_file = await resp.content.read()
+
+    with open(file_path, 'wb') as file:
+        file.write(raw_file)
+
+
+async def measure_lag(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - started - TICK)
+
+
+async def download(mode: str) -> None:
+    import http_client
+    from photo_manager import PhotoManager
+
+    folder = tempfile.mkdtemp()
+    config.TEMP_FILES_PATH = folder
+    manager = PhotoManager(asyncio.get_event_loop())
+    http_session = http_client.session(http_client.TELEGRAM)
+
+    if mode == 'streaming':
+        save = manager._save_photo_to_disk
+    else:
+        async def save(file_path: str, url: str):
+            await in_memory(http_session, file_path, url)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    lags: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.ensure_future(measure_lag(lags, stop))
+    started = time.perf_counter()
+
+    await asyncio.gather(*(
+        save(os.path.join(folder, f'{number}.jpg'),
+             f'{BASE_URL}/file/{number}.jpg')
+        for number in range(DOWNLOADS)
+    ))
+
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    await http_client.close()
+
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    lags.sort()
+
+    print(f'{mode:>10}: {elapsed:6.2f} s, ' +
+          f'peak RSS +{(rss_peak - rss_before) / 1024:6.1f} MB, ' +
+          f'loop lag p99 {1000 * lags[int(len(lags) * 0.99)]:6.1f} ms, ' +
+          f'max {1000 * lags[-1]:6.1f} ms')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        asyncio.run(download(sys.argv[1]))
+    else:
+        asyncio.run(serve())
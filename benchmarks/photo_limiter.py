@@ -0,0 +1,116 @@
+"""
+Load test of the photo pools against a local stub backend: one user sends
+a big album while the others send a photo each. Peak concurrent requests
+at the backend and how long the single photos wait, plain semaphore
+against the fair pool.
+
+    python -m benchmarks.photo_limiter
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from statistics import median
+
+from aiohttp import web
+
+import http_client
+from limiter import FairPool
+
+ALBUM = 100
+USERS = 20
+POOL_SIZE = 10
+DELAY = 0.05
+HOST = '127.0.0.1'
+PORT = 18767
+URL = f'http://{HOST}:{PORT}/file'
+
+in_flight = 0
+peak = 0
+
+
+async def photo(request: web.Request) -> web.Response:
+    global in_flight, peak
+
+    in_flight += 1
+    peak = max(peak, in_flight)
+
+    try:
+        await asyncio.sleep(DELAY)
+        return web.Response(body=b'\xff' * 1024, content_type='image/jpeg')
+    finally:
+        in_flight -= 1
+
+
+async def start_stub() -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get('/file', photo)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    return runner
+
+
+class SemaphorePool:
+    def __init__(self, size: int):
+        self._semaphore = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def slot(self, owner: int):
+        async with self._semaphore:
+            yield
+
+
+class Unbounded:
+    @asynccontextmanager
+    async def slot(self, owner: int):
+        yield
+
+
+async def download(pool, user_id: int) -> float:
+    started = time.monotonic()
+
+    async with pool.slot(user_id):
+        http_session = http_client.session(http_client.TELEGRAM)
+
+        async with http_session.get(URL) as resp:
+            await resp.read()
+
+    return time.monotonic() - started
+
+
+async def run(name: str, pool) -> None:
+    global peak
+    peak = 0
+
+    album = [download(pool, 0) for _ in range(ALBUM)]
+    singles = [download(pool, user_id) for user_id in range(1, USERS + 1)]
+
+    started = time.monotonic()
+    results = await asyncio.gather(*album, *singles)
+    total = time.monotonic() - started
+
+    single_times = results[ALBUM:]
+    print(f'{name:>10}: peak {peak:3} requests, total {total:.2f}s, '
+          f'single photo median {median(single_times):.2f}s, '
+          f'max {max(single_times):.2f}s')
+
+    if isinstance(pool, FairPool):
+        print(f'{"":>10}  {pool.stats()}')
+
+
+async def main() -> None:
+    runner = await start_stub()
+    await http_client.create()
+
+    try:
+        await run('unbounded', Unbounded())
+        await run('semaphore', SemaphorePool(POOL_SIZE))
+        await run('fair', FairPool(POOL_SIZE))
+    finally:
+        await http_client.close()
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
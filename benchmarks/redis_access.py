@@ -0,0 +1,120 @@
+"""
+Latency of the storage reads the handlers do (UserStorage.get and
+get_full_set, BotStorage counters, hits and misses) under concurrent load
+against the redis from config: EXISTS + GET as it was against the single
+GET of StorageRedis.
+
+    python -m benchmarks.redis_access
+"""
+import asyncio
+import functools
+import json
+import random
+import time
+from statistics import quantiles
+from typing import Any, Callable, List
+
+from storage_redis import StorageRedis
+
+PREFIX = 'benchmark_redis_access:'
+USERS = 1000
+OPERATIONS = 20000
+CONCURRENCY = 100
+
+
+async def old_get_value(storage: StorageRedis,
+                        key: str,
+                        default: Any = dict()) -> Any:
+    key = storage.PREFIX + key
+
+    if await storage._redis.exists(key):
+        raw_value = await storage._redis.get(key)
+        value: dict = json.loads(raw_value)
+        return value or default
+    else:
+        return default
+
+
+async def old_get_set(storage: StorageRedis,
+                      key: str,
+                      default: Any = ()) -> Any:
+    key = storage.PREFIX + key
+
+    if await storage._redis.exists(key):
+        raw_values = await storage._redis.smembers(key)
+        value = [raw_value.decode('utf8') for raw_value in raw_values]
+        return value or default
+    else:
+        return default
+
+
+def calls(storage: StorageRedis, old: bool) -> List[Callable]:
+    """
+    Half of the reads hit the existing keys, the others miss.
+    """
+    if old:
+        get_value = functools.partial(old_get_value, storage)
+        get_set = functools.partial(old_get_set, storage)
+    else:
+        get_value, get_set = storage.get_value, storage.get_set
+
+    def read_value():
+        return get_value(f'{random.randrange(USERS * 2)}:value')
+
+    def read_set():
+        return get_set(f'{random.randrange(USERS * 2)}:set')
+
+    def read_counter():
+        return get_value('appeals_sent_count', 0)
+
+    return [read_value, read_value, read_set, read_counter]
+
+
+async def fill(storage: StorageRedis) -> None:
+    for user in range(USERS):
+        await storage.set_value(f'{user}:value', {'language': 'ru'})
+        await storage.add_set_member(f'{user}:set', f'/tmp/{user}.jpg')
+
+    await storage.set_value('appeals_sent_count', 100500)
+
+
+async def run(storage: StorageRedis, old: bool) -> List[float]:
+    operations = calls(storage, old)
+    latencies: List[float] = list()
+    left = OPERATIONS
+
+    async def worker():
+        nonlocal left
+
+        while left > 0:
+            left -= 1
+            started = time.perf_counter()
+            await random.choice(operations)()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return latencies
+
+
+async def main() -> None:
+    storage = await StorageRedis.create(PREFIX)
+    await fill(storage)
+
+    try:
+        for name, old in (('exists + get', True), ('get', False)):
+            started = time.perf_counter()
+            latencies = await run(storage, old)
+            spent = time.perf_counter() - started
+
+            percentiles = quantiles(latencies, n=100)
+            print(f'{name:>12}: {OPERATIONS / spent:7.0f} reads/s, '
+                  f'p50 {percentiles[49] * 1000:.2f} ms, '
+                  f'p99 {percentiles[98] * 1000:.2f} ms')
+    finally:
+        keys = await storage._redis.keys(PREFIX + '*')
+        await storage._redis.delete(*keys)
+        storage._redis.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Hit rate and lookups per second of the geohash region cache on a busy
+spots workload: most of the reports come from a few hundred places in
+Minsk, each with a GPS jitter of some tens of meters.
+
+    python -m benchmarks.region_cache
+"""
+import random
+import time
+
+import config
+from benchmarks import synthetic
+from region_index import RegionIndex
+from region_resolver import RegionResolver
+
+SPOTS = 500
+LOOKUPS = 200000
+JITTER = 0.0003  # degrees, about 20-30 meters
+
+
+def workload(amount: int) -> list:
+    rnd = random.Random(7)
+    lon, lat, radius = synthetic.LAYOUT[config.MINSK]
+
+    spots = [[rnd.uniform(lon - radius, lon + radius),
+              rnd.uniform(lat - radius, lat + radius)]
+             for _ in range(SPOTS)]
+
+    # few spots are much more popular than others
+    weights = [1 / (rank + 1) for rank in range(SPOTS)]
+    chosen = rnd.choices(spots, weights=weights, k=amount)
+
+    return [[spot[0] + rnd.uniform(-JITTER, JITTER),
+             spot[1] + rnd.uniform(-JITTER, JITTER)]
+            for spot in chosen]
+
+
+def main():
+    index = {region: RegionIndex(boundary)
+             for region, boundary in synthetic.boundaries().items()}
+
+    points = workload(LOOKUPS)
+
+    exact = RegionResolver(index,
+                           config.REGION_CACHE_PRECISION,
+                           config.REGION_CACHE_SIZE)
+
+    started = time.perf_counter()
+    expected = [exact._walk(*point)[0] for point in points]
+    uncached = LOOKUPS / (time.perf_counter() - started)
+
+    resolver = RegionResolver(index,
+                              config.REGION_CACHE_PRECISION,
+                              config.REGION_CACHE_SIZE)
+
+    started = time.perf_counter()
+    found = [resolver.resolve(*point) for point in points]
+    cached = LOOKUPS / (time.perf_counter() - started)
+
+    mismatches = sum(a != b for a, b in zip(expected, found))
+
+    print(f'mismatches: {mismatches} of {LOOKUPS}')
+    print(f'hits: {resolver.hits}, boundary cells: {resolver.exact}, ' +
+          f'misses: {resolver.misses}, ' +
+          f'hit rate: {100 * resolver.hits / LOOKUPS:.1f}%')
+    print(f'{"index":>8}: {uncached:12.1f} lookups/s')
+    print(f'{"cache":>8}: {cached:12.1f} lookups/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Lookups per second of the region resolution: the old ray casting over
+every vertex against the precompiled RegionIndex, and the batch
+Locator.get_regions when NumPy is installed.
+
+    python -m benchmarks.region_lookup
+"""
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+import territory
+from benchmarks import synthetic
+from locator import Locator
+from region_index import RegionIndex, np
+
+LOOKUPS = 200
+
+
+def point_is_in_polygon(boundary, longitude, latitude):
+    overlap = False
+    vertices_amount = len(boundary)
+    j = vertices_amount - 1
+
+    for i in range(vertices_amount - 1):
+        if (((boundary[i][0] > longitude) !=
+                (boundary[j][0] > longitude)) and
+            (latitude <
+                (boundary[j][1] - boundary[i][1]) *
+                (longitude - boundary[i][0]) /
+                (boundary[j][0] - boundary[i][0]) + boundary[i][1])):
+            overlap = not overlap
+
+        j = i
+
+    return overlap
+
+
+def resolve(contains: Callable, coordinates, region=None) -> Optional[str]:
+    for region in territory.regions(region):
+        if contains(region, coordinates):
+            if territory.has_subregions(region):
+                return resolve(contains, coordinates, region)
+            else:
+                return region
+
+    return None
+
+
+def measure(name: str, contains: Callable, points: list) -> float:
+    started = time.perf_counter()
+
+    for point in points:
+        resolve(contains, point)
+
+    elapsed = time.perf_counter() - started
+    rate = len(points) / elapsed
+    print(f'{name:>12}: {rate:12.1f} lookups/s')
+    return rate
+
+
+def main():
+    boundaries = synthetic.boundaries()
+    points = synthetic.points(LOOKUPS)
+
+    def naive(region: str, coordinates) -> bool:
+        return any(point_is_in_polygon(area, *coordinates)
+                   for area in boundaries[region])
+
+    started = time.perf_counter()
+    index: Dict[str, RegionIndex] = {
+        region: RegionIndex(boundary)
+        for region, boundary in boundaries.items()
+    }
+    print(f'index build: {time.perf_counter() - started:.3f} s')
+
+    def indexed(region: str, coordinates) -> bool:
+        return index[region].contains(*coordinates)
+
+    mismatches = sum(resolve(naive, point) != resolve(indexed, point)
+                     for point in points)
+    print(f'mismatches: {mismatches} of {len(points)}')
+
+    before = measure('ray casting', naive, points)
+    after = measure('index', indexed, points * 100)
+    print(f'speedup: x{after / before:.0f}')
+
+    if np is not None:
+        asyncio.run(measure_batch(boundaries, points * 100))
+
+
+async def measure_batch(boundaries: dict, points: list) -> None:
+    locator = Locator(asyncio.get_event_loop())
+
+    for region, boundary in boundaries.items():
+        locator._set_boundary(region, boundary)
+
+    started = time.perf_counter()
+    await locator.get_regions(points)
+    elapsed = time.perf_counter() - started
+    print(f'{"batch":>12}: {len(points) / elapsed:12.1f} lookups/s')
+
+
+if __name__ == '__main__':
+    main()
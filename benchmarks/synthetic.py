@@ -0,0 +1,100 @@
+"""
+Synthetic boundaries shaped like the real Nominatim ones: noisy closed
+rings with the vertex counts we get for the oblasts and Minsk districts.
+"""
+import math
+import random
+from typing import Dict, List
+
+import config
+
+OBLAST_VERTICES = 30000
+MINSK_VERTICES = 6000
+DISTRICT_VERTICES = 2000
+
+# центр и радиус (в градусах) каждого региона
+LAYOUT = {
+    config.MINSK: (27.56, 53.90, 0.15),
+    config.BREST_REGION: (25.30, 52.40, 1.2),
+    config.VITSEBSK_REGION: (29.00, 55.30, 1.3),
+    config.HOMEL_REGION: (29.60, 52.20, 1.3),
+    config.HRODNA_REGION: (24.50, 53.70, 1.0),
+    config.MINSK_REGION: (27.60, 53.80, 1.1),
+    config.MAHILEU_REGION: (30.50, 53.80, 1.0),
+}
+
+MINSK_DISTRICTS = list(config.REGIONS[config.MINSK])
+
+
+def ring(center_lon: float,
+         center_lat: float,
+         radius: float,
+         vertices: int,
+         start: float = 0.0,
+         sweep: float = 2 * math.pi,
+         rnd: random.Random = None) -> List[List[float]]:
+    rnd = rnd or random.Random(0)
+    points = []
+
+    for step in range(vertices):
+        angle = start + sweep * step / vertices
+        # smooth wiggles plus a small jitter, like a river or a road
+        wiggle = 0.05 * math.sin(37 * angle) + 0.02 * math.sin(211 * angle)
+        distance = radius * (1 + wiggle + 0.0005 * rnd.uniform(-1, 1))
+        points.append([center_lon + distance * math.cos(angle),
+                       center_lat + distance * math.sin(angle)])
+
+    if sweep < 2 * math.pi:
+        # back to the start along the radius, short edges as in real data
+        first_lon, first_lat = points[0]
+        radial = vertices // 10
+
+        for step in range(radial + 1):
+            share = step / radial
+            points.append([
+                center_lon + (first_lon - center_lon) * share,
+                center_lat + (first_lat - center_lat) * share,
+            ])
+
+    points.append(points[0])
+    return points
+
+
+def boundaries(scale: float = 1.0) -> Dict[str, list]:
+    rnd = random.Random(42)
+    result = {}
+
+    for region, (lon, lat, radius) in LAYOUT.items():
+        vertices = MINSK_VERTICES if region == config.MINSK \
+            else OBLAST_VERTICES
+
+        result[region] = [ring(lon, lat, radius, int(vertices * scale),
+                               rnd=rnd)]
+
+    lon, lat, radius = LAYOUT[config.MINSK]
+    sweep = 2 * math.pi / len(MINSK_DISTRICTS)
+
+    for number, district in enumerate(MINSK_DISTRICTS):
+        result[district] = [ring(lon, lat, radius * 1.02,
+                                 int(DISTRICT_VERTICES * scale),
+                                 start=number * sweep,
+                                 sweep=sweep,
+                                 rnd=rnd)]
+
+    return result
+
+
+def points(amount: int, seed: int = 1) -> List[List[float]]:
+    """Half of the points are in Minsk, the rest all over the country."""
+    rnd = random.Random(seed)
+    lon, lat, radius = LAYOUT[config.MINSK]
+    result = []
+
+    for number in range(amount):
+        if number % 2:
+            result.append([rnd.uniform(lon - radius, lon + radius),
+                           rnd.uniform(lat - radius, lat + radius)])
+        else:
+            result.append([rnd.uniform(23.2, 32.8), rnd.uniform(51.3, 56.2)])
+
+    return result
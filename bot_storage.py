@@ -1,21 +1,35 @@
+import datetime
 import logging
 from asyncio import Semaphore
 from contextlib import asynccontextmanager
 from typing import Any, Dict
 
+import config
 from datetime_parser import get_today
 from storage_redis import StorageRedis
 
 PREFIX = "bot_storage:"
+APPEALS_COUNT = 'appeals_sent_count'
+
+# the counters of the last two days before the per day keys
+OLD_TODAY_COUNT = 'appeals_sent_today_count'
+OLD_YESTERDAY_COUNT = 'appeals_sent_yesterday_count'
+OLD_TODAY_DATE = 'appeals_sent_today_date'
+
 semaphore = Semaphore()
 logger = logging.getLogger(__name__)
 
 
+def day_key(date: str) -> str:
+    return f'appeals:{date}'
+
+
 class BotStorage():
     @classmethod
     async def create(cls):
         self = BotStorage()
         self._redis = await StorageRedis.create(PREFIX)
+        await self._migrate_appeals_counts()
         return self
 
     def __init__(self):
@@ -28,45 +42,60 @@ class BotStorage():
         await self._redis.set_value('banned_users', bans)
 
     async def get_appeals_count(self) -> int:
-        count = await self._redis.get_value('appeals_sent_count', 0)
+        count = await self._redis.get_value(APPEALS_COUNT, 0)
         return int(count)
 
     async def get_appeals_today_count(self) -> int:
-        return await self._redis.get_value('appeals_sent_today_count', 0)
+        return await self._redis.get_value(day_key(get_today()), 0)
 
     async def get_appeals_yesterday_count(self) -> int:
-        return await self._redis.get_value('appeals_sent_yesterday_count', 0)
+        return await self._redis.get_value(day_key(get_today(-1)), 0)
+
+    async def get_appeals_daily_counts(self, days: int) -> Dict[str, int]:
+        """
+        Appeals sent per day for the last days, the oldest first.
+        """
+        dates = [get_today(-shift) for shift in reversed(range(days))]
+
+        async with self._redis.pipeline() as pipeline:
+            counts = [pipeline.get_value(day_key(date), 0) for date in dates]
+
+        return {date: count.result() for date, count in zip(dates, counts)}
 
     async def update_appeals_count(self, amount=1):
-        await self._update_whole_count(amount)
-        await self._update_today_count(amount)
-
-    async def _update_whole_count(self, amount: int):
-        count = await self._redis.get_value('appeals_sent_count', 0)
-        await self._redis.set_value('appeals_sent_count', int(count) + amount)
-
-    async def _update_today_count(self, amount: int):
-        count = await self._redis.get_value('appeals_sent_today_count', None)
-        date = await self._redis.get_value('appeals_sent_today_date', None)
-        today = get_today()
-
-        if count is None or date is None:
-            await self._save_yesterday(0)
-            await self._redis.set_value('appeals_sent_today_count', amount)
-            await self._redis.set_value('appeals_sent_today_date', today)
+        async with self._redis.pipeline() as pipeline:
+            pipeline.increment(APPEALS_COUNT, amount)
+            pipeline.increment(day_key(get_today()),
+                               amount,
+                               config.APPEALS_DAILY_COUNT_TTL)
+
+    async def _migrate_appeals_counts(self):
+        """
+        Moves the counters of the last two days kept before the per day
+        keys.
+        """
+        async with self._redis.pipeline() as pipeline:
+            today_count = pipeline.get_value(OLD_TODAY_COUNT, 0)
+            yesterday_count = pipeline.get_value(OLD_YESTERDAY_COUNT, 0)
+            date = pipeline.get_value(OLD_TODAY_DATE, None)
+
+        if date.result() is None:
             return
 
-        if today != date:
-            await self._save_yesterday(count)
-            await self._redis.set_value('appeals_sent_today_count', amount)
-            await self._redis.set_value('appeals_sent_today_date', today)
-            return
+        last_date = datetime.date.fromisoformat(date.result())
+        previous_date = last_date - datetime.timedelta(days=1)
 
-        await self._redis.set_value('appeals_sent_today_count',
-                                    int(count) + amount)
+        async with self._redis.pipeline() as pipeline:
+            for count, day in ((today_count, last_date),
+                               (yesterday_count, previous_date)):
+                if count.result():
+                    pipeline.increment(day_key(day.isoformat()),
+                                       int(count.result()),
+                                       config.APPEALS_DAILY_COUNT_TTL)
 
-    async def _save_yesterday(self, amount: int):
-        await self._redis.set_value('appeals_sent_yesterday_count', amount)
+            pipeline.delete(OLD_TODAY_COUNT,
+                            OLD_YESTERDAY_COUNT,
+                            OLD_TODAY_DATE)
 
     @asynccontextmanager
     async def tasks(self):
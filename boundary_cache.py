@@ -0,0 +1,55 @@
+import gzip
+import json
+import logging
+import os
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+
+class BoundaryCache:
+    """
+    Regions boundaries saved on disk as gzipped json together with
+    the download time and ETag of each region.
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict[str, dict]:
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf8') as file:
+                data: dict = json.load(file)
+        except FileNotFoundError:
+            return dict()
+        except Exception:
+            logger.exception(f'Не удалось прочитать кеш границ {self.path}')
+            return dict()
+
+        if data.get('version') != FORMAT_VERSION:
+            logger.warning(f'Устаревший формат кеша границ {self.path}')
+            return dict()
+
+        return data.get('regions', dict())
+
+    def save(self, regions: Dict[str, dict], **meta) -> None:
+        """
+        regions: {region: {'boundary': list, 'etag': str, 'updated': float}}
+        meta: anything else worth to keep in the file, e.g. tolerance
+        """
+        data = {
+            **meta,
+            'version': FORMAT_VERSION,
+            'saved': time.time(),
+            'regions': regions,
+        }
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + '.tmp'
+
+        with gzip.open(temp_path, 'wt', encoding='utf8') as file:
+            json.dump(data, file, separators=(',', ':'))
+
+        os.replace(temp_path, self.path)
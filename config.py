@@ -15,6 +15,35 @@ PREVIOUS_ADDRESS_PREFIX = '/saved_'
 PREVIOUS_ADDRESS_REGEX = r'\/saved_\d+'
 APPEAL_STORAGE_LIMIT = 3
 TEMP_FILES_PATH = '/tmp/temp_files_parkun'
+PHOTO_DOWNLOAD_CHUNK_SIZE = 64 * 1024  # bytes
+PHOTO_PIPELINE_ENABLED = True  # upload from memory, not from the saved file
+PHOTO_STORE_DIR = 'photo_store'  # inside TEMP_FILES_PATH
+PHOTO_STORE_RECORD_TTL = 30 * 24 * 60 * 60  # seconds since the last update
+PHOTO_DOWNLOAD_CONCURRENCY = 20
+PHOTO_UPLOAD_CONCURRENCY = 10
+RECOGNITION_CONCURRENCY = 4
+TRASH_DIR = 'trash'  # inside TEMP_FILES_PATH
+JANITOR_INTERVAL = 10 * 60  # seconds
+JANITOR_BATCH_SIZE = 10  # folders removed at once
+PHOTO_STATS_INTERVAL = 10 * 60  # seconds between the pipeline stats logs
+
+# photo downscaling, needs Pillow
+IMAGE_RESIZE_ENABLED = False
+IMAGE_RESIZE_WORKERS = 2
+PHOTO_MAX_SIDE = 1600  # px, for telegra.ph and the mail
+PHOTO_QUALITY = 85
+RECOGNITION_PHOTO_MAX_SIDE = 1024  # px
+RECOGNITION_PHOTO_QUALITY = 90
+PHOTO_KEEP_ORIGINAL = False
+
+# telegra.ph uploads
+TELEGRAPH_UPLOAD_BATCH_SIZE = 10  # files in one request
+TELEGRAPH_UPLOAD_BATCH_DELAY = 0.3  # seconds to wait for more files
+TELEGRAPH_UPLOAD_TRIES = 5
+TELEGRAPH_RETRY_PAUSE = 1  # seconds, doubled with every try
+TELEGRAPH_RETRY_MAX_PAUSE = 30  # seconds
+TELEGRAPH_RETRY_BUDGET_RATIO = 0.2  # retries per request
+TELEGRAPH_RETRY_BUDGET_MIN = 10  # retries
 
 # regionalization
 MINSK = 'minsk'
@@ -73,10 +102,49 @@ OSM_REGIONS = {
     MAHILEU_REGION: 'Mahilyow Region, Belarus',
 }
 
+# http clients, see http_client.py
+HTTP_CONNECTIONS_LIMIT = 100
+HTTP_CONNECTIONS_PER_HOST_LIMIT = 20
+HTTP_KEEPALIVE_TIMEOUT = 30  # seconds
+HTTP_DNS_CACHE_TTL = 300  # seconds
+HTTP_TIMEOUTS = {  # aiohttp.ClientTimeout arguments per client, seconds
+    'default': {'total': 60, 'connect': 10},
+    'telegram': {'total': 120, 'connect': 10},
+    'telegraph': {'total': 120, 'connect': 10},
+    'nominatim': {'total': None, 'connect': 5},
+    'recognizer': {'total': 120, 'connect': 5},
+}
+
 # redis
 REDIS_HOST = 'localhost'
 REDIS_PORT = '16379'
 REDIS_PASSWORD = 'redis'
+REDIS_SCAN_COUNT = 1000  # keys per SCAN call
+REDIS_POOL_MIN_SIZE = 1  # connections shared by the storages
+REDIS_POOL_MAX_SIZE = 10
+
+# appeals statistic
+APPEALS_DAILY_COUNT_TTL = 400 * 24 * 60 * 60  # seconds, per day counters
+
+# regions boundaries download
+BOUNDARIES_DOWNLOAD_CONCURRENCY = 2
+# usage policy of nominatim: no more than a request per second
+NOMINATIM_REQUEST_INTERVAL = 1  # seconds between the request starts
+NOMINATIM_USER_AGENT = 'parkun_bot'
+BOUNDARY_RETRY_PAUSE = 1  # seconds, doubled after every failed try
+BOUNDARY_RETRY_MAX_PAUSE = 60  # seconds
+
+# regions boundaries cache
+BOUNDARIES_CACHE_PATH = '/tmp/parkun_boundaries/boundaries.json.gz'
+BOUNDARIES_CACHE_MAX_AGE = 7  # days
+
+# simplified boundaries prepared by prepare_boundaries.py, if the file exists
+# these regions are never downloaded
+BOUNDARIES_DATASET_PATH = 'boundaries.json.gz'
+
+# regions lookup cache
+REGION_CACHE_PRECISION = 7  # geohash length, 7 is about 90 x 150 meters here
+REGION_CACHE_SIZE = 100000  # cells
 
 # bot owner's telegram id to receive feedback
 ADMIN_ID = 00000000
@@ -86,6 +154,16 @@ YANDEX_MAPS_API_KEY = 'UNNECESSARY_FOR_DEV'
 BASE_YANDEX_MAPS_URL = 'http://localhost:18080/yandex_maps/?'
 ADDRESS_FAIL = 'no_address'
 
+# geocoder answers cache
+GEOCODER_CACHE_PRECISION = 4  # digits after the point, about 10 meters
+GEOCODER_CACHE_TTL = 7 * 24 * 60 * 60  # seconds
+GEOCODER_CACHE_NEGATIVE_TTL = 60 * 60  # seconds, for "nothing found"
+GEOCODER_CACHE_SIZE = 10000  # answers kept in memory
+
+# offline geocoder, csv with houses (see local_geocoder.py), empty to disable
+LOCAL_GEOCODER_DATASET = ''
+LOCAL_GEOCODER_MAX_DISTANCE = 50  # meters to the nearest house
+
 # to post into channel bot needs to be admin there
 CHANNEL = '@channel_name'
 TRASH_CHANNEL = '@channel_name'
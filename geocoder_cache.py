@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+
+from storage_redis import StorageRedis
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'geocoder_cache:'
+
+
+class GeocoderCache:
+    """
+    Geocoder answers: in-memory LRU with TTL in front of the redis cache
+    shared by all the bot processes. Concurrent lookups of the same key
+    wait for the single request in flight.
+
+    The negative answer ("nothing found") is cached too, but for
+    negative_ttl seconds only.
+    """
+    @classmethod
+    async def create(cls,
+                     prefix: str,
+                     ttl: int,
+                     size: int,
+                     negative: Any = None,
+                     negative_ttl: int = 0):
+        self = GeocoderCache(ttl, size, negative, negative_ttl)
+        self._redis = await StorageRedis.create(f'{PREFIX}{prefix}:')
+        return self
+
+    def __init__(self,
+                 ttl: int,
+                 size: int,
+                 negative: Any = None,
+                 negative_ttl: int = 0):
+        self.ttl = ttl
+        self.size = size
+        self.negative = negative
+        self.negative_ttl = negative_ttl
+        self._redis: StorageRedis
+        self._local: OrderedDict = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = dict()
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable]) -> Any:
+        """
+        Cached value or the result of fetch().
+        """
+        cached = self._local.get(key)
+
+        if cached and cached[0] > time.monotonic():
+            self._local.move_to_end(key)
+            return cached[1]
+
+        if key in self._in_flight:
+            return await asyncio.shield(self._in_flight[key])
+
+        future = asyncio.get_event_loop().create_future()
+        self._in_flight[key] = future
+
+        try:
+            value = await self._redis.get_value(key, None)
+
+            if value is None:
+                value = await fetch()
+
+                if self._ttl(value):
+                    await self._redis.set_value(key, value, self._ttl(value))
+
+            if self._ttl(value):
+                self._remember(key, value)
+
+            future.set_result(value)
+            return value
+        except Exception as exc:
+            future.set_exception(exc)
+
+            # the waiters get it, don't log it as never retrieved
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+            if not future.done():
+                future.cancel()
+
+    def _ttl(self, value: Any) -> int:
+        """
+        None is a failed request and isn't cached at all.
+        """
+        if value is None:
+            return 0
+
+        if self.negative is not None and value == self.negative:
+            return self.negative_ttl
+
+        return self.ttl
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._local[key] = (time.monotonic() + self._ttl(value), value)
+        self._local.move_to_end(key)
+
+        if len(self._local) > self.size:
+            self._local.popitem(last=False)
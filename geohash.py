@@ -0,0 +1,30 @@
+"""
+Geohash cells as integer (x, y) pairs. A geohash of N chars halves the
+longitude range ceil(5N / 2) times and the latitude range floor(5N / 2)
+times, so the cell is found with plain arithmetic instead of building the
+base32 string bit by bit.
+"""
+from typing import Tuple
+
+BITS_PER_CHAR = 5
+
+Cell = Tuple[int, int]
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    bits = precision * BITS_PER_CHAR
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 360.0 / (1 << lon_bits), 180.0 / (1 << lat_bits)
+
+
+def cell_bounds(geo_cell: Cell,
+                precision: int) -> Tuple[float, float, float, float]:
+    """
+    Returns (min_lon, min_lat, max_lon, max_lat) of the cell.
+    """
+    width, height = cell_size(precision)
+    x, y = geo_cell
+    min_lon = x * width - 180.0
+    min_lat = y * height - 90.0
+    return min_lon, min_lat, min_lon + width, min_lat + height
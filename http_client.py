@@ -0,0 +1,59 @@
+"""
+Process-wide pooled http sessions, one per upstream service, so
+connections are kept alive and reused between requests.
+"""
+from typing import Dict
+
+import aiohttp
+
+import config
+
+DEFAULT = 'default'
+TELEGRAM = 'telegram'
+TELEGRAPH = 'telegraph'
+YANDEX_MAPS = 'yandex_maps'
+NOMINATIM = 'nominatim'
+RABBIT = 'rabbit'
+RECOGNIZER = 'recognizer'
+MAIL_VERIFIER = 'mail_verifier'
+
+CLIENTS = (DEFAULT, TELEGRAM, TELEGRAPH, YANDEX_MAPS, NOMINATIM, RABBIT,
+           RECOGNIZER, MAIL_VERIFIER)
+
+_sessions: Dict[str, aiohttp.ClientSession] = dict()
+
+
+def session(name: str = DEFAULT) -> aiohttp.ClientSession:
+    http_session = _sessions.get(name)
+
+    if http_session is None or http_session.closed:
+        http_session = _create_session(name)
+        _sessions[name] = http_session
+
+    return http_session
+
+
+def _create_session(name: str) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=config.HTTP_CONNECTIONS_LIMIT,
+        limit_per_host=config.HTTP_CONNECTIONS_PER_HOST_LIMIT,
+        keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+        use_dns_cache=True,
+        ttl_dns_cache=config.HTTP_DNS_CACHE_TTL)
+
+    timeouts = config.HTTP_TIMEOUTS.get(name, config.HTTP_TIMEOUTS[DEFAULT])
+
+    return aiohttp.ClientSession(connector=connector,
+                                 timeout=aiohttp.ClientTimeout(**timeouts))
+
+
+async def create() -> None:
+    for name in CLIENTS:
+        session(name)
+
+
+async def close() -> None:
+    for http_session in _sessions.values():
+        await http_session.close()
+
+    _sessions.clear()
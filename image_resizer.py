@@ -0,0 +1,84 @@
+"""
+Size-capped JPEG copies of the photos, made in a process pool. Optional,
+needs Pillow.
+"""
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Sequence, Tuple
+
+import config
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+Size = Tuple[int, int]  # max side, JPEG quality
+
+
+def downscale(data: bytes, sizes: Sequence[Size]) -> List[bytes]:
+    """
+    The photo fitted into every max_side x max_side of the sizes, decoded
+    once. The original bytes stand for a copy that isn't smaller anyway.
+    """
+    results = [data] * len(sizes)
+
+    # the bigger copies first, the smaller ones are made from them
+    order = sorted(range(len(sizes)),
+                   key=lambda number: sizes[number][0],
+                   reverse=True)
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+        for number in order:
+            max_side, quality = sizes[number]
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            result = io.BytesIO()
+            image.save(result, 'JPEG', quality=quality, optimize=True)
+
+            if result.tell() < len(data):
+                results[number] = result.getvalue()
+
+    return results
+
+
+class ImageResizer:
+    def __init__(self):
+        self.enabled = config.IMAGE_RESIZE_ENABLED and Image is not None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def resize(self, data: bytes, *sizes: Size) -> List[bytes]:
+        """
+        Copies of the photo for every size with one decoding.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(config.IMAGE_RESIZE_WORKERS)
+
+        loop = asyncio.get_event_loop()
+
+        try:
+            results = await loop.run_in_executor(self._pool,
+                                                 downscale,
+                                                 data,
+                                                 sizes)
+        except BrokenProcessPool:
+            self._pool = None
+            results = [data] * len(sizes)
+        except Exception:
+            # not an image Pillow can read, leave it as it is
+            results = [data] * len(sizes)
+
+        self.bytes_in += len(data) * len(sizes)
+        self.bytes_out += sum(map(len, results))
+        return results
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import os
+import secrets
+from typing import Awaitable, Callable, Optional
+
+import async_fs
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class Janitor:
+    """
+    Removes the photo folders in the background. The request path only
+    moves a folder to the trash, which is a single rename, and the janitor
+    deletes the trash in batches.
+    """
+    def __init__(self,
+                 files_dir: str,
+                 after_sweep: Optional[Callable[[], Awaitable]] = None):
+        self.trash_dir = os.path.join(files_dir, config.TRASH_DIR)
+        self.after_sweep = after_sweep
+        self._dirty = asyncio.Event()
+
+        os.makedirs(self.trash_dir, exist_ok=True)
+
+    async def throw_away(self, path: str) -> None:
+        trash_path = os.path.join(self.trash_dir, secrets.token_hex(8))
+
+        try:
+            await async_fs.rename(path, trash_path)
+        except FileNotFoundError:
+            return
+
+        self._dirty.set()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(),
+                                       config.JANITOR_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception('Failed to sweep the trash')
+
+    async def sweep(self) -> int:
+        self._dirty.clear()
+        folders = await async_fs.listdir(self.trash_dir)
+
+        for start in range(0, len(folders), config.JANITOR_BATCH_SIZE):
+            batch = folders[start:start + config.JANITOR_BATCH_SIZE]
+
+            await asyncio.gather(*(
+                async_fs.rmtree(os.path.join(self.trash_dir, folder))
+                for folder in batch
+            ))
+
+        if folders and self.after_sweep:
+            await self.after_sweep()
+
+        return len(folders)
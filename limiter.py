@@ -0,0 +1,147 @@
+"""
+Bounded pools for the photo work: downloads from telegram, uploads to
+telegra.ph and numberplate recognition. Pacer for the APIs that limit the
+request rate.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict
+
+import config
+
+DOWNLOAD = 'download'
+UPLOAD = 'upload'
+RECOGNITION = 'recognition'
+
+
+class FairPool:
+    """
+    At most size slots at once. The waiting users are served in turns, so
+    an album of one user doesn't hold the others back.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.active = 0
+        self._queues: Dict[Any, Deque[asyncio.Future]] = OrderedDict()
+
+        self.served = 0
+        self.waited = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asynccontextmanager
+    async def slot(self, owner: Any):
+        await self.acquire(owner)
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, owner: Any):
+        self.served += 1
+
+        if self.active < self.size and not self._queues:
+            self.active += 1
+            return
+
+        future = asyncio.get_event_loop().create_future()
+        self._queues.setdefault(owner, deque()).append(future)
+        started = time.monotonic()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # the slot was given already
+                self.release()
+            else:
+                self._forget(owner, future)
+
+            raise
+        finally:
+            waited = time.monotonic() - started
+            self.waited += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+
+    def release(self):
+        self.active -= 1
+
+        while self._queues and self.active < self.size:
+            # the next owner in turn, it goes to the end of the line
+            owner, queue = self._queues.popitem(last=False)
+            future = queue.popleft()
+
+            if queue:
+                self._queues[owner] = queue
+
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    def _forget(self, owner: Any, future: asyncio.Future):
+        queue = self._queues.get(owner)
+
+        if queue is None:
+            return
+
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+
+        if not queue:
+            self._queues.pop(owner, None)
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'active': self.active,
+            'queued': self.queued,
+            'served': self.served,
+            'waited': self.waited,
+            'average_wait': self.wait_time / self.waited if self.waited else 0,
+            'max_wait': self.max_wait_time,
+        }
+
+
+class Pacer:
+    """
+    Starts of the requests at least interval seconds apart, whoever makes
+    them.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait(self) -> None:
+        async with self._lock:
+            pause = self._next_start - time.monotonic()
+
+            if pause > 0:
+                await asyncio.sleep(pause)
+
+            self._next_start = time.monotonic() + self.interval
+
+
+class Limiter:
+    def __init__(self):
+        self.pools = {
+            DOWNLOAD: FairPool(config.PHOTO_DOWNLOAD_CONCURRENCY),
+            UPLOAD: FairPool(config.PHOTO_UPLOAD_CONCURRENCY),
+            RECOGNITION: FairPool(config.RECOGNITION_CONCURRENCY),
+        }
+
+    def slot(self, pool: str, owner: Any):
+        return self.pools[pool].slot(owner)
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self.pools.items()}
@@ -0,0 +1,155 @@
+"""
+Offline geocoder for the addresses from a local dataset, e.g. the houses of
+Minsk exported from OSM. CSV with the header:
+
+    street_ru,street_by,house,longitude,latitude
+    улица Немига,вуліца Няміга,5,27.5486,53.9036
+"""
+import csv
+import math
+from typing import Dict, List, Optional, Tuple
+
+from addresses import normalize_address
+
+DESCRIPTIONS = {
+    'ru_RU': 'Минск, Беларусь',
+    'be_BY': 'Мінск, Беларусь',
+}
+
+METERS_PER_DEGREE = 111320
+
+# адрес, который без стоп-слов совпал с адресом другого дома, например
+# улица и переулок с одним названием
+AMBIGUOUS = -1
+
+Point = Tuple[float, float, int]  # x, y, номер дома
+
+
+class LocalGeocoder:
+    """
+    KD-tree over the houses for the reverse lookups and the normalized
+    address index for the forward ones.
+    """
+    @classmethod
+    def load(cls, path: str, max_distance: float):
+        with open(path, encoding='utf8', newline='') as file:
+            rows = list(csv.DictReader(file))
+
+        return LocalGeocoder(rows, max_distance)
+
+    def __init__(self, rows: List[dict], max_distance: float):
+        self.max_distance = max_distance
+        self._streets: List[Tuple[str, str]] = []
+        self._houses: List[str] = []
+        self._coordinates: List[List[float]] = []
+        self._addresses: Dict[str, int] = dict()
+
+        for row in rows:
+            number = len(self._houses)
+            street_ru = row['street_ru']
+            street_by = row.get('street_by') or street_ru
+
+            self._streets.append((street_ru, street_by))
+            self._houses.append(row['house'])
+            self._coordinates.append([float(row['longitude']),
+                                      float(row['latitude'])])
+
+            for street in (street_ru, street_by):
+                address = f'{street} {row["house"]}'
+                self._index(normalize_address(address, drop_stop_words=True),
+                            number)
+
+        latitudes = [latitude for _, latitude in self._coordinates] or [0]
+        middle_latitude = sum(latitudes) / len(latitudes)
+        self._lon_scale = math.cos(math.radians(middle_latitude))
+
+        self._tree: List[Point] = [
+            (longitude * self._lon_scale, latitude, number)
+            for number, (longitude, latitude) in enumerate(self._coordinates)
+        ]
+
+        self._build(0, len(self._tree), 0)
+
+    def _index(self, key: str, number: int) -> None:
+        known = self._addresses.setdefault(key, number)
+
+        if known not in (number, AMBIGUOUS) and \
+                self._coordinates[known] != self._coordinates[number]:
+            self._addresses[key] = AMBIGUOUS
+
+    def __len__(self) -> int:
+        return len(self._houses)
+
+    def _build(self, first: int, last: int, axis: int) -> None:
+        """
+        Implicit tree: the median of the [first, last) range is the node,
+        the halves to the left and to the right are the subtrees.
+        """
+        if last - first <= 1:
+            return
+
+        self._tree[first:last] = sorted(self._tree[first:last],
+                                        key=lambda point: point[axis])
+
+        middle = (first + last) // 2
+        self._build(first, middle, 1 - axis)
+        self._build(middle + 1, last, 1 - axis)
+
+    def _nearest(self, x: float, y: float) -> Tuple[float, int]:
+        best = [math.inf, -1]
+
+        # отрезок дерева, ось и нижняя граница расстояния до его точек
+        stack = [(0, len(self._tree), 0, 0.0)]
+
+        while stack:
+            first, last, axis, bound = stack.pop()
+
+            if first >= last or bound >= best[0]:
+                continue
+
+            middle = (first + last) // 2
+            point = self._tree[middle]
+            distance = (point[0] - x) ** 2 + (point[1] - y) ** 2
+
+            if distance < best[0]:
+                best = [distance, point[2]]
+
+            delta = (x, y)[axis] - point[axis]
+            near, far = (first, middle), (middle + 1, last)
+
+            if delta > 0:
+                near, far = far, near
+
+            stack.append((*far, 1 - axis, delta ** 2))
+            stack.append((*near, 1 - axis, 0.0))
+
+        return math.sqrt(best[0]) * METERS_PER_DEGREE, best[1]
+
+    def address(self,
+                longitude: float,
+                latitude: float,
+                lang: str = 'ru_RU') -> Optional[str]:
+        if not self._tree:
+            return None
+
+        distance, number = self._nearest(longitude * self._lon_scale,
+                                         latitude)
+
+        if distance > self.max_distance:
+            return None
+
+        street_ru, street_by = self._streets[number]
+        street = street_by if lang == 'be_BY' else street_ru
+        description = DESCRIPTIONS.get(lang, DESCRIPTIONS['ru_RU'])
+
+        return f'{street}, {self._houses[number]}, {description}'
+
+    def coordinates(self, address: str) -> Optional[List[float]]:
+        key = normalize_address(address, drop_stop_words=True)
+        number = self._addresses.get(key)
+
+        # неоднозначный адрес пусть ищет удаленный геокодер
+        if number is None or number == AMBIGUOUS:
+            return None
+
+        return list(self._coordinates[number])
@@ -2,27 +2,144 @@ from asyncio.events import AbstractEventLoop
 import asyncio
 import aiohttp
 import config
+import http_client
 import json
 import territory
 import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+from addresses import normalize_address
+from boundary_cache import BoundaryCache
+from geocoder_cache import GeocoderCache
+from limiter import Pacer
+from local_geocoder import LocalGeocoder
+from region_index import RegionIndex, np
+from region_resolver import RegionResolver
 from scheduler import Scheduler, RELOAD_BOUNDARY
 import datetime_parser
 
 
 logger = logging.getLogger(__name__)
 
+NOT_FOUND = 'not_found'
+
 
 class Locator:
+    @classmethod
+    async def create(cls, loop: AbstractEventLoop):
+        self = Locator(loop)
+
+        self._address_cache = await GeocoderCache.create(
+            'address',
+            config.GEOCODER_CACHE_TTL,
+            config.GEOCODER_CACHE_SIZE,
+            config.ADDRESS_FAIL,
+            config.GEOCODER_CACHE_NEGATIVE_TTL)
+
+        self._coordinates_cache = await GeocoderCache.create(
+            'coordinates',
+            config.GEOCODER_CACHE_TTL,
+            config.GEOCODER_CACHE_SIZE,
+            NOT_FOUND,
+            config.GEOCODER_CACHE_NEGATIVE_TTL)
+
+        if config.LOCAL_GEOCODER_DATASET:
+            self._local_geocoder = await loop.run_in_executor(
+                None,
+                LocalGeocoder.load,
+                config.LOCAL_GEOCODER_DATASET,
+                config.LOCAL_GEOCODER_MAX_DISTANCE)
+
+            logger.info(f"Локальный геокодер: {len(self._local_geocoder)} " +
+                        "домов")
+
+        return self
+
     def __init__(self, loop: AbstractEventLoop):
-        self._timeout = aiohttp.ClientTimeout(connect=5)
         self._boundaries = {}
+        self._index: Dict[str, RegionIndex] = {}
+        self._resolver = RegionResolver(self._index,
+                                        config.REGION_CACHE_PRECISION,
+                                        config.REGION_CACHE_SIZE)
+        self._boundaries_meta: Dict[str, dict] = {}
+        self._cache = BoundaryCache(config.BOUNDARIES_CACHE_PATH)
+        self._dataset = BoundaryCache(config.BOUNDARIES_DATASET_PATH)
+        self._bundled = set()
+        self._cache_lock = asyncio.Lock()
+        self._download_semaphore = asyncio.Semaphore(
+            config.BOUNDARIES_DOWNLOAD_CONCURRENCY)
+        self._nominatim_pacer = Pacer(config.NOMINATIM_REQUEST_INTERVAL)
+        self.boundaries_ready = asyncio.Event()
+        self.boundaries_load_time: Optional[float] = None
+        self.boundary_timings: Dict[str, float] = {}
         self.loop = loop
         self.scheduler: Scheduler
         self.bot_id: int = 0
+        self._address_cache: GeocoderCache
+        self._coordinates_cache: GeocoderCache
+        self._local_geocoder: Optional[LocalGeocoder] = None
 
     async def get_boundary(self,
                            region: str,
                            try_counter=5) -> None:
+        """
+        Downloads the region with retries, exponential backoff and jitter.
+        It's the RELOAD_BOUNDARY executor of the scheduler too.
+        """
+        started = time.monotonic()
+
+        for attempt in range(try_counter + 1):
+            if attempt:
+                pause = random.uniform(
+                    0,
+                    min(config.BOUNDARY_RETRY_MAX_PAUSE,
+                        config.BOUNDARY_RETRY_PAUSE * 2 ** attempt))
+
+                logger.info(f"Еще одна попытка для региона {region} " +
+                            f"через {pause:.1f} с")
+
+                await asyncio.sleep(pause)
+
+            async with self._download_semaphore:
+                # the retries are paced too
+                await self._nominatim_pacer.wait()
+                boundary, etag = await self._fetch_boundary(region)
+
+            if boundary != []:
+                break
+
+        self.boundary_timings[region] = time.monotonic() - started
+
+        if boundary is None:
+            logger.info(f"Границы региона {region} не изменились")
+            self._boundaries_meta[region]['updated'] = time.time()
+            await self._save_cache()
+
+        elif not boundary:
+            logger.warning(f"Закончились попытки для региона {region}")
+            asyncio.ensure_future(self.download_boundary_later(region))
+
+            if region not in self._boundaries:
+                self._set_boundary(region, [])
+
+        else:
+            logger.info(f"Загружены границы региона {region}")
+            self._set_boundary(region, boundary)
+            self._boundaries_meta[region] = {
+                'etag': etag,
+                'updated': time.time(),
+            }
+
+            await self._save_cache()
+
+    async def _fetch_boundary(
+            self,
+            region: str) -> Tuple[Optional[list], Optional[str]]:
+        """
+        Returns boundary and its ETag. Boundary is None if it's the same as
+        the cached one and empty list if the download failed.
+        """
         region_name = config.OSM_REGIONS[region]
         url = 'http://nominatim.openstreetmap.org/search?'
 
@@ -32,16 +149,27 @@ class Locator:
             ('polygon_geojson', 1)
         )
 
+        headers = {'User-Agent': config.NOMINATIM_USER_AGENT}
+        etag = self._boundaries_meta.get(region, {}).get('etag')
+
+        if etag and self._boundaries.get(region):
+            headers['If-None-Match'] = etag
+
         try:
-            async with aiohttp.ClientSession() as http_session:
-                async with http_session.get(url,
-                                            params=params,
-                                            timeout=self._timeout) as response:
-                    if response.status != 200:
-                        return None
+            http_session = http_client.session(http_client.NOMINATIM)
+
+            async with http_session.get(url,
+                                        params=params,
+                                        headers=headers) as response:
+                if response.status == 304:
+                    return None, etag
+
+                if response.status != 200:
+                    return [], None
 
-                    resp_json = await response.json(content_type=None)
-                    boundary = resp_json[0]['geojson']['coordinates'][0]
+                etag = response.headers.get('ETag')
+                resp_json = await response.json(content_type=None)
+                boundary = resp_json[0]['geojson']['coordinates'][0]
 
         except aiohttp.ServerTimeoutError:
             boundary = []
@@ -49,6 +177,9 @@ class Locator:
         except aiohttp.ClientOSError:
             boundary = []
 
+        except asyncio.TimeoutError:
+            boundary = []
+
         except json.JSONDecodeError:
             boundary = []
 
@@ -59,20 +190,12 @@ class Locator:
             logger.exception(f"Ошибка при загрузке региона")
             boundary = []
 
-        if not boundary:
-            await asyncio.sleep(5)
-
-            if try_counter > 0:
-                logger.info(f"Еще одна попытка для региона {region}")
-                await self.get_boundary(region, try_counter - 1)
-            else:
-                logger.warning(f"Закончились попытки для региона {region}")
-                asyncio.ensure_future(self.download_boundary_later(region))
-                self._boundaries[region] = []
+        return boundary, etag
 
-        else:
-            logger.info(f"Загружены границы региона {region}")
-            self._boundaries[region] = boundary
+    def _set_boundary(self, region: str, boundary: list) -> None:
+        self._index[region] = RegionIndex(boundary)
+        self._boundaries[region] = boundary
+        self._resolver.clear()
 
     async def download_boundary_later(self, region: str):
         task = {
@@ -87,70 +210,152 @@ class Locator:
 
         await self.scheduler.add_task(task)
 
-    async def download_boundaries(self):
-        tasks = []
+    async def load_local_boundaries(self) -> None:
+        """
+        Bundled dataset first, then the cache for the rest of the regions.
+        """
+        bundled = await self.loop.run_in_executor(None, self._dataset.load)
+        cached = await self.loop.run_in_executor(None, self._cache.load)
 
-        for region in config.OSM_REGIONS:
-            task = asyncio.ensure_future(self.get_boundary(region))
-            tasks.append(task)
-            await asyncio.sleep(1)
+        for region, entry in bundled.items():
+            if region not in config.OSM_REGIONS or not entry['boundary']:
+                continue
 
-        asyncio.gather(*tasks)
+            self._set_boundary(region, entry['boundary'])
+            self._bundled.add(region)
 
-    def __point_is_in_polygon(self, boundary, longitude, latitude):
-        overlap = False
-        vertices_amount = len(boundary)
-        j = vertices_amount - 1
+        for region, entry in cached.items():
+            if region not in config.OSM_REGIONS or not entry['boundary']:
+                continue
 
-        for i in range(vertices_amount - 1):
-            if (((boundary[i][0] > longitude) !=
-                    (boundary[j][0] > longitude)) and
-                (latitude <
-                    (boundary[j][1] - boundary[i][1]) *
-                    (longitude - boundary[i][0]) /
-                    (boundary[j][0] - boundary[i][0]) + boundary[i][1])):
-                overlap = not overlap
+            if region in self._bundled:
+                continue
 
-            j = i
+            self._set_boundary(region, entry['boundary'])
 
-        return overlap
+            self._boundaries_meta[region] = {
+                'etag': entry.get('etag'),
+                'updated': entry.get('updated', 0),
+            }
 
-    def __areas_in_region(self, boundaries):
-        """Если регион разбит на части, то будем возвращать каждую"""
-        try:
-            if isinstance(boundaries[0][0], list):
-                for boundary in boundaries:
-                    if isinstance(boundary[0][0], list):
-                        yield self.__areas_in_region(boundary)
-                    else:
-                        yield boundary
-            else:
-                yield boundaries
-        except IndexError:
-            yield []
+        logger.info(f"Границы из датасета: {len(self._bundled)} регионов, " +
+                    f"из кеша: {len(self._boundaries_meta)} регионов")
+
+    async def _save_cache(self) -> None:
+        regions = {
+            region: {'boundary': self._boundaries[region], **meta}
+            for region, meta in self._boundaries_meta.items()
+        }
+
+        async with self._cache_lock:
+            try:
+                await self.loop.run_in_executor(None,
+                                                self._cache.save,
+                                                regions)
+            except Exception:
+                logger.exception("Не удалось сохранить кеш границ")
+
+    def _boundary_is_fresh(self, region: str) -> bool:
+        if region in self._bundled:
+            return True
+
+        if not self._boundaries.get(region):
+            return False
+
+        updated = self._boundaries_meta.get(region, {}).get('updated', 0)
+        max_age = config.BOUNDARIES_CACHE_MAX_AGE * 24 * 60 * 60
+        return time.time() - updated < max_age
+
+    async def download_boundaries(self):
+        """
+        Downloads all the regions missing in the local data or stale there.
+        boundaries_ready is set when every region is either loaded or out
+        of tries.
+        """
+        started = time.monotonic()
+
+        regions = [region
+                   for region in config.OSM_REGIONS
+                   if not self._boundary_is_fresh(region)]
+
+        results = await asyncio.gather(
+            *(self.get_boundary(region) for region in regions),
+            return_exceptions=True)
+
+        for region, result in zip(regions, results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка при загрузке региона {region}",
+                             exc_info=result)
+
+        self.boundaries_load_time = time.monotonic() - started
+        self.boundaries_ready.set()
+
+        logger.info(f"Границы регионов готовы за " +
+                    f"{self.boundaries_load_time:.1f} с, " +
+                    f"загружено {len(regions)} регионов")
 
     async def get_region(self, coordinates, region=None):
         if not isinstance(coordinates, list):
             return None
 
-        for region in territory.regions(region):
-            if region not in self._boundaries:
+        return self._resolver.resolve(coordinates[0], coordinates[1], region)
+
+    async def get_regions(self, coordinates_list: list) -> List[Optional[str]]:
+        """
+        Batch get_region for re-routing and backfills.
+        """
+        if np is None:
+            return [await self.get_region(coordinates)
+                    for coordinates in coordinates_list]
+
+        regions: List[Optional[str]] = [None] * len(coordinates_list)
+
+        positions = np.array([
+            position
+            for position, coordinates in enumerate(coordinates_list)
+            if isinstance(coordinates, list)
+        ], dtype=np.intp)
+
+        points = np.array([coordinates_list[position]
+                           for position in positions],
+                          dtype=np.float64).reshape(-1, 2)
+
+        self._resolve_many(points[:, 0], points[:, 1], positions, regions)
+        return regions
+
+    def _resolve_many(self,
+                      longitudes,
+                      latitudes,
+                      positions,
+                      regions: List[Optional[str]],
+                      parent: Optional[str] = None) -> None:
+        for region in territory.regions(parent):
+            index = self._index.get(region)
+
+            if index is None or not len(positions):
                 continue
 
-            areas = self.__areas_in_region(self._boundaries[region])
+            inside = index.contains_many(longitudes, latitudes)
 
-            for area in areas:
-                if self.__point_is_in_polygon(area,
-                                              coordinates[0],
-                                              coordinates[1]):
-                    if territory.has_subregions(region):
-                        return await self.get_region(coordinates, region)
-                    else:
-                        return region
+            if not inside.any():
+                continue
 
-    async def get_address(self, coordinates, language=config.RU):
-        coordinates = (str(coordinates[0]) + ', ' + str(coordinates[1]))
+            if territory.has_subregions(region):
+                self._resolve_many(longitudes[inside],
+                                   latitudes[inside],
+                                   positions[inside],
+                                   regions,
+                                   region)
+            else:
+                for position in positions[inside]:
+                    regions[position] = region
+
+            outside = ~inside
+            longitudes = longitudes[outside]
+            latitudes = latitudes[outside]
+            positions = positions[outside]
 
+    async def get_address(self, coordinates, language=config.RU):
         if language == config.RU:
             lang = 'ru_RU'
         elif language == config.BY:
@@ -158,6 +363,25 @@ class Locator:
         else:
             lang = 'ru_RU'
 
+        if self._local_geocoder:
+            address = self._local_geocoder.address(coordinates[0],
+                                                   coordinates[1],
+                                                   lang)
+
+            if address:
+                return address
+
+        precision = config.GEOCODER_CACHE_PRECISION
+        key = f'{round(coordinates[0], precision)}:' + \
+            f'{round(coordinates[1], precision)}:{lang}'
+
+        return await self._address_cache.get(
+            key,
+            lambda: self._request_address(coordinates, lang))
+
+    async def _request_address(self, coordinates, lang: str):
+        coordinates = (str(coordinates[0]) + ', ' + str(coordinates[1]))
+
         params = (
             ('geocode', coordinates),
             ('kind', 'house'),
@@ -166,27 +390,44 @@ class Locator:
             ('lang', lang)
         )
 
-        async with aiohttp.ClientSession() as http_session:
-            async with http_session.get(config.BASE_YANDEX_MAPS_URL,
-                                        params=params) as response:
-                if response.status != 200:
-                    return None
+        http_session = http_client.session(http_client.YANDEX_MAPS)
 
-                resp_json = await response.json(content_type=None)
-                address_array = resp_json['response']['GeoObjectCollection']
+        async with http_session.get(config.BASE_YANDEX_MAPS_URL,
+                                    params=params) as response:
+            if response.status != 200:
+                return None
 
-                try:
-                    address_bottom = \
-                        address_array['featureMember'][0]['GeoObject']
+            resp_json = await response.json(content_type=None)
+            address_array = resp_json['response']['GeoObjectCollection']
 
-                    address = address_bottom['name'] + ', ' +\
-                        address_bottom['description']
-                except IndexError:
-                    address = config.ADDRESS_FAIL
+            try:
+                address_bottom = \
+                    address_array['featureMember'][0]['GeoObject']
 
-                return address
+                address = address_bottom['name'] + ', ' +\
+                    address_bottom['description']
+            except IndexError:
+                address = config.ADDRESS_FAIL
+
+            return address
 
     async def get_coordinates(self, address):
+        if self._local_geocoder:
+            coordinates = self._local_geocoder.coordinates(address)
+
+            if coordinates:
+                return coordinates
+
+        coordinates = await self._coordinates_cache.get(
+            normalize_address(address),
+            lambda: self._request_coordinates(address))
+
+        if coordinates == NOT_FOUND:
+            return None
+
+        return coordinates
+
+    async def _request_coordinates(self, address):
         params = (
             ('apikey', config.YANDEX_MAPS_API_KEY),
             ('geocode', address),
@@ -194,25 +435,26 @@ class Locator:
             ('format', 'json'),
         )
 
-        async with aiohttp.ClientSession() as http_session:
-            async with http_session.get(config.BASE_YANDEX_MAPS_URL,
-                                        params=params) as response:
-                if response.status != 200:
-                    return None
+        http_session = http_client.session(http_client.YANDEX_MAPS)
 
-                resp_json = await response.json(content_type=None)
-                address_array = resp_json['response']['GeoObjectCollection']
+        async with http_session.get(config.BASE_YANDEX_MAPS_URL,
+                                    params=params) as response:
+            if response.status != 200:
+                return None
 
-                try:
-                    address_bottom = \
-                        address_array['featureMember'][0]['GeoObject']
+            resp_json = await response.json(content_type=None)
+            address_array = resp_json['response']['GeoObjectCollection']
 
-                    str_coordinates = address_bottom['Point']['pos']
-                    str_coordinates = str_coordinates.split(' ')
+            try:
+                address_bottom = \
+                    address_array['featureMember'][0]['GeoObject']
 
-                    coordinates = [float(str_coordinates[0]),
-                                   float(str_coordinates[1])]
-                except IndexError:
-                    return None
+                str_coordinates = address_bottom['Point']['pos']
+                str_coordinates = str_coordinates.split(' ')
 
-                return coordinates
+                coordinates = [float(str_coordinates[0]),
+                               float(str_coordinates[1])]
+            except IndexError:
+                return NOT_FOUND
+
+            return coordinates
@@ -23,6 +23,8 @@ from disposable_email_domains import blocklist
 
 import config
 import datetime_parser
+import http_client
+import storage_redis
 import territory
 import users
 from rabbit_amqp import Rabbit as AMQPRabbit
@@ -54,7 +56,8 @@ bot = Bot(token=config.API_TOKEN, loop=loop)
 
 storage = RedisStorage2(host=config.REDIS_HOST,
                         port=config.REDIS_PORT,
-                        password=config.REDIS_PASSWORD)
+                        password=config.REDIS_PASSWORD,
+                        pool_size=config.REDIS_POOL_MAX_SIZE)
 
 dp = Dispatcher(bot, storage=storage)
 mail_verifier = MailVerifier()
@@ -868,7 +871,7 @@ async def add_photo_to_attachments(photo: PhotoSize,
     data['violation_photo_ids'].append(photo['file_id'])
 
     url = await get_temp_photo_url(photo['file_id'])
-    photo_manager.stash_photo(user_id, url)
+    photo_manager.stash_photo(user_id, url, photo['file_unique_id'])
 
 
 async def get_temp_photo_url(photo_id: str) -> str:
@@ -4111,11 +4114,13 @@ async def ask_for_button_press(message: types.Message, state: FSMContext):
 
 
 async def create_global_objects():
+    await http_client.create()
+
     global bot_storage
     bot_storage = await BotStorage.create()
 
     global locator
-    locator = Locator(loop)
+    locator = await Locator.create(loop)
 
     executors = {
         CANCEL_ON_IDLE: maybe_return_to_state,
@@ -4141,6 +4146,7 @@ async def startup(dispatcher: Dispatcher):
     asyncio.ensure_future(rabbit_amqp.start(loop, status_received))
     logger.info('Подключились.')
     logger.info('Загружаем границы регионов.')
+    await locator.load_local_boundaries()
     asyncio.ensure_future(locator.download_boundaries())
     logger.info('Запускаем планировщик.')
     asyncio.ensure_future(scheduler.start())
@@ -4151,6 +4157,9 @@ async def shutdown(dispatcher: Dispatcher):
 
     await dispatcher.storage.close()
     await dispatcher.storage.wait_closed()
+    await storage_redis.close_shared_redis()
+    await http_client.close()
+    photo_manager.resizer.close()
 
 
 def main():
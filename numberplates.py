@@ -2,9 +2,9 @@ import logging
 import re
 from typing import List, Match, Optional
 
-import aiohttp
-
 import config
+import http_client
+
 
 logger = logging.getLogger(__name__)
 
@@ -69,15 +69,16 @@ async def recognize_numberplates(path: str) -> List[str]:
     url = config.NUMBERPLATES_RECOGNIZER_URL
     data = {'path': path}
 
-    async with aiohttp.ClientSession() as http_session:
-        async with http_session.post(url, json=data) as response:
-            try:
-                result = await response.json()
-                numberplates = format_raw_numbers(result['data'])
-                return numberplates
-            except Exception:
-                logger.exception('Numberplate recognition error')
-                return list()
+    http_session = http_client.session(http_client.RECOGNIZER)
+
+    async with http_session.post(url, json=data) as response:
+        try:
+            result = await response.json()
+            numberplates = format_raw_numbers(result['data'])
+            return numberplates
+        except Exception:
+            logger.exception('Numberplate recognition error')
+            return list()
 
 
 def format_raw_numbers(raw_numbers: List[str]) -> List[str]:
@@ -1,30 +1,88 @@
 import asyncio
+import io
 import logging
 import os
-import secrets
 import shutil
 import time
 from asyncio.events import AbstractEventLoop
-from contextlib import contextmanager
-from typing import Any, Awaitable, List, Union
+from typing import Awaitable, Dict, List, Optional, Union
 
 import aiohttp
 
 import config
+import async_fs
+import http_client
+from image_resizer import ImageResizer
+from janitor import Janitor
+from limiter import DOWNLOAD, RECOGNITION, Limiter
+from photo_store import PhotoStore
 from telegraph import Telegraph
+from telegraph_uploader import TelegraphUploader
 from user_storage import UserStorage
 from numberplates import recognize_numberplates
 
 logger = logging.getLogger(__name__)
 CURRENT = "current"
 STORAGE_PREFIX = "photo_manager"
+ORIGINAL_SUFFIX = '.original'
+RECOGNITION_SUFFIX = '.recognition.jpg'
+TELEGRAPH_URL = 'https://telegra.ph'
+
+
+class PhotoJob:
+    """
+    Photo tasks of an appeal. Recognition and upload wait for the storing,
+    the page waits for the upload.
+    """
+    __slots__ = ('store', 'recognize', 'upload', 'page')
+
+    def __init__(self):
+        self.store: List[asyncio.Task] = list()
+        self.recognize: List[asyncio.Task] = list()
+        self.upload: List[asyncio.Task] = list()
+        self.page: List[asyncio.Task] = list()
+
+    def frontier(self) -> List[asyncio.Task]:
+        """
+        Every storing is done when its upload and recognition are.
+        """
+        return self.page + self.upload + self.recognize
+
+    def in_progress(self, tasks: List[asyncio.Task]) -> bool:
+        return any(not task.done() for task in tasks)
+
+    async def wait(self, tasks: List[asyncio.Task]):
+        pending = [task for task in tasks if not task.done()]
+
+        if not pending:
+            return
+
+        # one failed photo shouldn't fail the others of the appeal
+        results = await asyncio.gather(*pending, return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f'Photo task failed: {result!r}')
+
+    async def wait_all(self):
+        await self.wait(self.frontier())
+
+    def cancel(self, tasks: List[asyncio.Task]):
+        for task in tasks:
+            if not task.done():
+                task.cancel()
 
 
 class PhotoManager:
     def __init__(self, loop: AbstractEventLoop):
         self.files_dir = config.TEMP_FILES_PATH
-        self.task_storage = dict()
+        self.jobs: Dict[int, Dict[Union[int, str], PhotoJob]] = dict()
         self.data_storage: UserStorage
+        self.photo_store: PhotoStore
+        self.janitor: Janitor
+        self.limiter = Limiter()
+        self.resizer = ImageResizer()
+        self.uploader = TelegraphUploader(self.limiter)
         self.telegraph = Telegraph(loop)
 
         try:
@@ -36,11 +94,44 @@ class PhotoManager:
     async def create(cls, loop: AbstractEventLoop):
         self = PhotoManager(loop)
         self.data_storage = await UserStorage.create(STORAGE_PREFIX)
+        await self.data_storage.migrate()
+        self.photo_store = await PhotoStore.create(self.files_dir)
+
+        self.janitor = Janitor(self.files_dir, self.photo_store.collect)
+        asyncio.ensure_future(self.janitor.run())
+        asyncio.ensure_future(self._log_stats())
         return self
 
     def __del__(self):
         shutil.rmtree(self.files_dir, ignore_errors=True)
 
+    def stats(self) -> dict:
+        return {
+            'limiter': self.limiter.stats(),
+            'uploader': self.uploader.stats(),
+            'resizer': {
+                'bytes_in': self.resizer.bytes_in,
+                'bytes_out': self.resizer.bytes_out,
+            },
+        }
+
+    async def _log_stats(self):
+        """
+        A degraded telegra.ph shows up as the fallbacks growing.
+        """
+        fallbacks = 0
+
+        while True:
+            await asyncio.sleep(config.PHOTO_STATS_INTERVAL)
+            stats = self.stats()
+
+            if stats['uploader']['fallbacks'] > fallbacks:
+                logger.warning(f'Photo uploads fell back: {stats}')
+            else:
+                logger.info(f'Photo pipeline: {stats}')
+
+            fallbacks = stats['uploader']['fallbacks']
+
     def valid(self, photos_data: dict) -> bool:
         try:
             assert(photos_data['file_paths'])
@@ -53,51 +144,79 @@ class PhotoManager:
         except Exception:
             return False
 
-    def stash_photo(self, user_id: int, temp_url: str):
-        tasks: list
-
-        with self.tasks(self.task_storage,
-                        list(),
-                        user_id,
-                        CURRENT,
-                        'store_photo_tasks') as tasks:
-            storing_task = asyncio.create_task(
-                self.store_photo(user_id, temp_url)
-            )
-
-            tasks.append(storing_task)
-
-        with self.tasks(self.task_storage,
-                        list(),
-                        user_id,
-                        CURRENT,
-                        'numberplate_tasks') as tasks:
-            numberplate_task = asyncio.create_task(
-                self.recognize_numberplate(user_id, storing_task)
-            )
-
-            tasks.append(numberplate_task)
-
-        with self.tasks(self.task_storage,
-                        list(),
-                        user_id,
-                        CURRENT,
-                        'upload_to_cloud_tasks') as tasks:
-            upload_to_cloud_task = asyncio.create_task(
-                self.upload_to_cloud(user_id, temp_url, storing_task)
-            )
-
-            tasks.append(upload_to_cloud_task)
+    def stash_photo(self,
+                    user_id: int,
+                    temp_url: str,
+                    photo_id: Optional[str] = None):
+        """
+        photo_id is the content id of the photo, the photos seen before
+        are taken from the photo store.
+        """
+        # one download feeds both the file and the upload
+        buffer = io.BytesIO() if config.PHOTO_PIPELINE_ENABLED else None
+        photo_record = asyncio.create_task(self.photo_store.get(photo_id))
+
+        job = self._job(user_id, CURRENT)
+
+        storing_task = asyncio.create_task(
+            self.store_photo(user_id,
+                             temp_url,
+                             buffer=buffer,
+                             photo_id=photo_id,
+                             photo_record=photo_record)
+        )
+
+        job.store.append(storing_task)
+
+        job.recognize.append(asyncio.create_task(
+            self.recognize_numberplate(user_id,
+                                       storing_task,
+                                       photo_id=photo_id,
+                                       photo_record=photo_record)
+        ))
+
+        job.upload.append(asyncio.create_task(
+            self.upload_to_cloud(user_id,
+                                 temp_url,
+                                 storing_task,
+                                 buffer=buffer,
+                                 photo_id=photo_id,
+                                 photo_record=photo_record)
+        ))
 
     async def store_photo(self,
                           user_id: int,
                           temp_url: str,
-                          stash_id: Union[int, str] = CURRENT) -> str:
-        folder_path = self._get_user_dir(user_id, stash_id)
+                          stash_id: Union[int, str] = CURRENT,
+                          buffer: Optional[io.BytesIO] = None,
+                          photo_id: Optional[str] = None,
+                          photo_record: Optional[Awaitable] = None
+                          ) -> Optional[str]:
+        """
+        Path of the stored photo or None if it couldn't be downloaded.
+        """
+        folder_path = await self._get_user_dir(user_id, stash_id)
         file_name = temp_url.split('/')[-1]
         file_path = self.get_unique_file_path(folder_path, file_name)
-
-        await self._save_photo_to_disk(file_path, temp_url)
+        record: dict = await photo_record if photo_record else dict()
+
+        if 'path' not in record or \
+                not await self.photo_store.link(record, file_path):
+            try:
+                async with self.limiter.slot(DOWNLOAD, user_id):
+                    await self._save_photo_to_disk(file_path,
+                                                   temp_url,
+                                                   buffer)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                # only the photos get to the store and the appeal
+                logger.warning(f'Failed to download {temp_url}: {exc}')
+                await async_fs.remove(file_path)
+                return None
+
+            if self.resizer.enabled:
+                await self._downscale(file_path, buffer)
+
+            await self.photo_store.add_file(photo_id, file_path)
 
         await self.data_storage.add_set_member(user_id,
                                                key=f'{stash_id}:file_paths',
@@ -108,49 +227,128 @@ class PhotoManager:
                               user_id: int,
                               temp_url: str,
                               photo_file_path: Awaitable,
-                              stash_id: Union[int, str] = CURRENT) -> str:
+                              stash_id: Union[int, str] = CURRENT,
+                              buffer: Optional[io.BytesIO] = None,
+                              photo_id: Optional[str] = None,
+                              photo_record: Optional[Awaitable] = None
+                              ) -> Optional[str]:
         file_path = await photo_file_path
-        permanent_url = await self._upload_photo(file_path, temp_url)
 
-        await self.data_storage.add_set_member(user_id,
-                                               key=f'{stash_id}:urls',
-                                               value=permanent_url)
+        if file_path is None:
+            return None
+
+        record: dict = await photo_record if photo_record else dict()
+        permanent_url = record.get('url')
+
+        if not permanent_url:
+            # the buffer is empty if the file was taken from the store
+            content = buffer.getvalue() if buffer else None
+
+            permanent_url = await self._upload_photo(user_id,
+                                                     file_path,
+                                                     temp_url,
+                                                     content or None)
+
+            if permanent_url != temp_url:
+                await self.photo_store.add_url(photo_id, permanent_url)
+
+        # the same photo sent twice has the same url, it's still a pair
+        # for its file
+        await self.data_storage.append(user_id,
+                                       key=f'{stash_id}:urls',
+                                       value=permanent_url)
         return permanent_url
 
     async def recognize_numberplate(
             self,
             user_id: int,
             photo_file_path: Awaitable,
-            stash_id: Union[int, str] = CURRENT) -> List[str]:
+            stash_id: Union[int, str] = CURRENT,
+            photo_id: Optional[str] = None,
+            photo_record: Optional[Awaitable] = None) -> List[str]:
         file_path = await photo_file_path
 
-        if recognized_numbers := await recognize_numberplates(file_path):
+        if file_path is None:
+            return []
+
+        record: dict = await photo_record if photo_record else dict()
+        recognized_numbers = record.get('numberplates')
+
+        if self.resizer.enabled and \
+                await async_fs.exists(file_path + RECOGNITION_SUFFIX):
+            file_path += RECOGNITION_SUFFIX
+
+        if recognized_numbers is None:
+            async with self.limiter.slot(RECOGNITION, user_id):
+                recognized_numbers = await recognize_numberplates(file_path)
+
+            # nothing found may be a recognizer failure, try it next time
+            if recognized_numbers:
+                await self.photo_store.add_numberplates(photo_id,
+                                                        recognized_numbers)
+
+        if recognized_numbers:
             await self.data_storage.add_set_member(user_id,
                                                    f'{stash_id}:numberplates',
                                                    *recognized_numbers)
 
         return recognized_numbers
 
+    async def _downscale(self,
+                         file_path: str,
+                         buffer: Optional[io.BytesIO] = None):
+        """
+        Replaces the photo with the size-capped one, for the upload and the
+        mail, and puts the smaller copy for the recognizer next to it.
+        """
+        if buffer is not None:
+            original = buffer.getvalue()
+        else:
+            original = await async_fs.read_bytes(file_path)
+
+        sizes = [(config.PHOTO_MAX_SIDE, config.PHOTO_QUALITY)]
+
+        if config.NUMBERPLATES_RECOGNIZER_ENABLED:
+            sizes.append((config.RECOGNITION_PHOTO_MAX_SIDE,
+                          config.RECOGNITION_PHOTO_QUALITY))
+
+        # both copies with one decoding
+        photo, *recognition_photos = await self.resizer.resize(original,
+                                                               *sizes)
+
+        for recognition_photo in recognition_photos:
+            if recognition_photo != original:
+                await async_fs.write_bytes(file_path + RECOGNITION_SUFFIX,
+                                           recognition_photo)
+
+        if photo == original:
+            return
+
+        if config.PHOTO_KEEP_ORIGINAL:
+            await async_fs.rename(file_path, file_path + ORIGINAL_SUFFIX)
+
+        await async_fs.write_bytes(file_path, photo)
+
+        if buffer is not None:
+            buffer.seek(0)
+            buffer.truncate()
+            buffer.write(photo)
+
     def get_unique_file_path(self, folder_path: str, file_name: str) -> str:
         timestamp = str(time.time()).replace('.', '')
         file_path = os.path.join(folder_path, timestamp + file_name)
         return file_path
 
     def stash_page(self, user_id: int, title: str):
-        page_tasks: list
-
-        with self.tasks(self.task_storage,
-                        list(),
-                        user_id, CURRENT, 'page_tasks') as page_tasks:
-            storing_task = asyncio.create_task(
-                self._create_page(user_id, title)
-            )
+        job = self._job(user_id, CURRENT)
 
-            page_tasks.append(storing_task)
+        job.page.append(asyncio.create_task(
+            self._create_page(user_id, title, job)
+        ))
 
-    async def _create_page(self, user_id: int, title: str):
-        await self._wait_for_done(user_id, CURRENT, 'store_photo_tasks')
-        await self._wait_for_done(user_id, CURRENT, 'upload_to_cloud_tasks')
+    async def _create_page(self, user_id: int, title: str, job: PhotoJob):
+        # every upload waits for its photo to be stored
+        await job.wait(job.upload)
 
         urls: list = await self.data_storage.get_full_set(
             user_id,
@@ -163,94 +361,42 @@ class PhotoManager:
                                     value=page_url)
 
     async def set_id_to_current_photos(self, user_id: int, appeal_id: int):
-        await self.clear_storage(user_id, appeal_id)
-        await self._wait_for_done(user_id, CURRENT, 'store_photo_tasks')
-        await self._wait_for_done(user_id, CURRENT, 'numberplate_tasks')
-        await self._wait_for_done(user_id, CURRENT, 'upload_to_cloud_tasks')
-        await self._wait_for_done(user_id, CURRENT, 'page_tasks')
-
-        # rename folder_name in file paths
-        old_paths: list = await self.data_storage.get_full_set(
-            user_id,
-            key=f'{CURRENT}:file_paths')
-
-        file_paths = list(map(
-            lambda path: path.replace(CURRENT, str(appeal_id)),
-            old_paths
-        ))
-
-        await self.data_storage.add_set_member(
-            user_id,
-            f'{appeal_id}:file_paths',
-            *file_paths)
-
-        # rename folder_name in numberplates
-        old_numberplates_path: list = await self.data_storage.get_full_set(
-            user_id,
-            key=f'{CURRENT}:numberplates')
-
-        numberplates = list(map(
-            lambda path: path.replace(CURRENT, str(appeal_id)),
-            old_numberplates_path
-        ))
-
-        await self.data_storage.add_set_member(
-            user_id,
-            f'{appeal_id}:numberplates',
-            *numberplates)
-
-        # rename folder_name in urls
-        old_urls: list = await self.data_storage.get_full_set(
-            user_id,
-            key=f'{CURRENT}:urls')
-
-        new_urls = list(map(
-            lambda path: path.replace(CURRENT, str(appeal_id)),
-            old_urls
-        ))
+        # the data keys of the appeal are overwritten by the move below
+        await self._clear_task_storage(user_id, appeal_id)
+        await self.janitor.throw_away(
+            self._get_user_dir_name(user_id, appeal_id))
 
-        await self.data_storage.add_set_member(
-            user_id,
-            f'{appeal_id}:urls',
-            *new_urls)
+        await self._job(user_id, CURRENT).wait_all()
 
-        # rename folder name in page_url
-        page_url: str = await self.data_storage.get(user_id,
-                                                    f'{CURRENT}:page_url')
+        # one atomic round trip, folder name is renamed in the lists too
+        await self.data_storage.move(user_id,
+                                     CURRENT,
+                                     str(appeal_id),
+                                     CURRENT,
+                                     str(appeal_id))
 
-        await self.data_storage.set(user_id,
-                                    key=f'{appeal_id}:page_url',
-                                    value=page_url)
-
-        # rename key in task storage
-        with self.tasks(self.task_storage, dict(), user_id) as user_stash:
-            appeal_stash: dict = user_stash.get(CURRENT, {})
-            user_stash[appeal_id] = appeal_stash
-            user_stash.pop(CURRENT, None)
+        # move the job to the appeal
+        user_jobs = self.jobs.setdefault(user_id, dict())
+        user_jobs[appeal_id] = user_jobs.pop(CURRENT, PhotoJob())
 
         # rename files folder
-        current_path = self._get_user_dir(user_id, CURRENT)
+        current_path = await self._get_user_dir(user_id, CURRENT)
         new_path = self._get_user_dir_name(user_id, appeal_id)
-        os.rename(current_path, new_path)
+        await async_fs.rename(current_path, new_path)
 
     async def get_photo_data(self, user_id: int, appeal_id: int) -> dict:
-        await self._wait_for_done(user_id, appeal_id, 'store_photo_tasks')
-        await self._wait_for_done(user_id, appeal_id, 'upload_to_cloud_tasks')
-        await self._wait_for_done(user_id, appeal_id, 'page_tasks')
-
-        appeal_stash = dict()
+        job = self._job(user_id, appeal_id)
 
-        appeal_stash['urls'] = await self.data_storage.get_full_set(
-            user_id,
-            f'{appeal_id}:urls')
+        # numberplates aren't needed here
+        await job.wait(job.page + job.upload)
 
-        appeal_stash['file_paths'] = await self.data_storage.get_full_set(
-            user_id,
-            f'{appeal_id}:file_paths')
+        appeal_data = await self.data_storage.get_group(user_id,
+                                                        str(appeal_id))
+        appeal_stash = dict()
 
-        appeal_stash['page_url'] = await self.data_storage.get(
-            user_id,
-            f'{appeal_id}:page_url')
+        appeal_stash['urls'] = appeal_data.get('urls', ())
+        appeal_stash['file_paths'] = appeal_data.get('file_paths', ())
+        appeal_stash['page_url'] = appeal_data.get('page_url', dict())
 
         return appeal_stash
 
@@ -258,80 +404,43 @@ class PhotoManager:
             self,
             user_id: int,
             appeal_id: Union[int, str] = CURRENT) -> bool:
-        with self.tasks(self.task_storage,
-                        list(),
-                        user_id,
-                        appeal_id,
-                        'numberplate_tasks') as tasks:
-            for task in tasks:
-                if not task.done():
-                    return True
-
-        return False
+        job = self._job(user_id, appeal_id)
+        return job.in_progress(job.recognize)
 
     async def cancel_recognition_task(
             self,
             user_id: int,
             appeal_id: Union[int, str] = CURRENT):
-        with self.tasks(self.task_storage,
-                        list(),
-                        user_id,
-                        appeal_id,
-                        'numberplate_tasks') as tasks:
-            for task in tasks:
-                if not task.done():
-                    task.cancel()
+        job = self._job(user_id, appeal_id)
+        job.cancel(job.recognize)
 
     async def get_numberplates(
             self,
             user_id: int,
             appeal_id: Union[int, str] = CURRENT) -> List[str]:
-        await self._wait_for_done(user_id, appeal_id, 'numberplate_tasks')
+        job = self._job(user_id, appeal_id)
+        await job.wait(job.recognize)
 
         numberplates = await self.data_storage.get_full_set(
             user_id, f'{appeal_id}:numberplates')
 
         return numberplates
 
-    async def _wait_for_done(self,
-                             user_id: int,
-                             appeal_id: Union[int, str],
-                             tasks_group_name: str):
-        with self.tasks(self.task_storage,
-                        list(),
-                        user_id, appeal_id, tasks_group_name) as tasks:
-            for task in tasks:
-                if not task.done():
-                    await task
-
-            tasks = []
-
-    async def _cancel_tasks(self,
-                            user_id: int,
-                            appeal_id: Union[int, str],
-                            tasks_group_name: str):
-        with self.tasks(self.task_storage,
-                        list(),
-                        user_id, appeal_id, tasks_group_name) as tasks:
-            for task in tasks:
-                if not task.cancelled():
-                    task.cancel()
-
-            tasks = []
+    def _job(self, user_id: int, appeal_id: Union[int, str]) -> PhotoJob:
+        user_jobs = self.jobs.setdefault(user_id, dict())
+        return user_jobs.setdefault(appeal_id, PhotoJob())
 
     def _get_user_dir_name(self,
                            user_id: int,
                            appeal_id: Union[int, str]) -> str:
         return os.path.join(self.files_dir, str(user_id), str(appeal_id))
 
-    def _get_user_dir(self, user_id: int, appeal_id: Union[int, str]) -> str:
+    async def _get_user_dir(self,
+                            user_id: int,
+                            appeal_id: Union[int, str]) -> str:
         dir_path = self._get_user_dir_name(user_id, appeal_id)
-
-        try:
-            os.makedirs(dir_path)
-            return dir_path
-        except FileExistsError:
-            return dir_path
+        await async_fs.makedirs(dir_path)
+        return dir_path
 
     async def clear_storage(self,
                             user_id: int,
@@ -341,108 +450,71 @@ class PhotoManager:
         await self._clear_data_storage(user_id, appeal_id)
 
         if with_files:
-            shutil.rmtree(self._get_user_dir(user_id, appeal_id),
-                          ignore_errors=True)
+            await self.janitor.throw_away(
+                self._get_user_dir_name(user_id, appeal_id))
 
     async def _clear_task_storage(self,
                                   user_id: int,
                                   appeal_id: Union[int, str]):
-        await self._wait_for_done(user_id, appeal_id, 'store_photo_tasks')
-        await self._wait_for_done(user_id, appeal_id, 'page_tasks')
-        await self._wait_for_done(user_id, appeal_id, 'numberplate_tasks')
-        await self._wait_for_done(user_id, appeal_id, 'upload_to_cloud_tasks')
+        user_jobs = self.jobs.get(user_id, {})
+        job = user_jobs.get(appeal_id)
+
+        if job:
+            await job.wait_all()
 
-        user_stash: dict = self.task_storage.get(user_id, {})
-        user_stash.pop(appeal_id, None)
+        user_jobs.pop(appeal_id, None)
 
-        if not user_stash:
-            self.task_storage.pop(user_id, None)
+        if not user_jobs:
+            self.jobs.pop(user_id, None)
 
     async def _clear_data_storage(self,
                                   user_id: int,
                                   appeal_id: Union[int, str]):
-        await self.data_storage.delete_by_pattern(
-            user_id,
-            pattern=f'{str(appeal_id)}:*')
+        await self.data_storage.delete_group(user_id, str(appeal_id))
+
+    async def _upload_photo(self,
+                            user_id: int,
+                            file_path: str,
+                            temp_url: str,
+                            content: Optional[bytes] = None) -> str:
+        if content is None:
+            content = await async_fs.read_bytes(file_path)
 
-    async def _upload_photo(self, file_path: str, temp_url: str) -> str:
-        file_id = await self._upload_file(file_path)
+        file_id = await self.uploader.upload(user_id, content)
 
         if file_id:
-            full_path = 'https://telegra.ph' + file_id
+            full_path = TELEGRAPH_URL + file_id
         else:
+            logger.warning(f'Fallback to the temporary url for {file_path}')
             full_path = temp_url
 
         return full_path
 
-    async def _upload_file(self, file_path: str) -> str:
-        uploaded = False
-        tries = 5
-        file_id = ''
-
-        while not uploaded:
-            form = aiohttp.FormData(quote_fields=False)
-
-            with open(file_path, 'rb') as file:
-                form.add_field(secrets.token_urlsafe(8),
-                               file,
-                               filename='file',
-                               content_type='image/jpg')
-
-                upload_url = 'https://telegra.ph/upload'
-
-                async with aiohttp.ClientSession() as http_session:
-                    async with http_session.post(upload_url, data=form) as r:
-                        result = await r.json()
-
-            if isinstance(result, dict) and 'error' in result:
-                if tries != 0:
-                    await asyncio.sleep(1)
-                    tries -= 1
-                else:
-                    uploaded = True
-            else:
-                uploaded = True
-                file_id = result[0]['src']
-
-        return file_id
-
-    async def _save_photo_to_disk(self, file_path: str, url: str):
-        async with aiohttp.ClientSession() as http_session:
-            async with http_session.get(url) as resp:
-                raw_file = await resp.content.read()
-
-        with open(file_path, 'wb') as file:
-            file.write(raw_file)
-
-    @contextmanager
-    def tasks(self, storage: dict, default: Any, path: str, *paths) -> Any:
-        tasks = self.get_tasks(storage, default, path, *paths)
-
-        try:
-            yield tasks
-        finally:
-            self.set_tasks(storage, tasks, path, *paths)
-
-    def set_tasks(self, storage: dict, value: Any, path: str, *paths):
+    async def _save_photo_to_disk(self,
+                                  file_path: str,
+                                  url: str,
+                                  buffer: Optional[io.BytesIO] = None):
         """
-        save value by path
+        Writes the chunks as they arrive, file operations are done in the
+        executor to keep the loop free. The chunks are also kept in buffer
+        if it's given. Raises ClientResponseError if Telegram answers with
+        an error.
         """
-        if paths:
-            storage.setdefault(path, dict())
-            self.set_tasks(storage[path], value, *paths)
-        else:
-            storage[path] = value
+        loop = asyncio.get_event_loop()
+        http_session = http_client.session(http_client.TELEGRAM)
 
-    def get_tasks(self, storage: dict, default: Any, path: str, *paths):
-        """
-        recursive extracting value from dict tree
-        """
-        tasks = storage.get(path, dict())
+        async with http_session.get(url) as resp:
+            # an error body isn't a photo, don't let it into the store
+            resp.raise_for_status()
+
+            file = await loop.run_in_executor(None, open, file_path, 'wb')
 
-        if paths:
-            tasks = self.get_tasks(tasks, default, *paths)
-        elif not tasks:
-            tasks = default
+            try:
+                async for chunk in resp.content.iter_chunked(
+                        config.PHOTO_DOWNLOAD_CHUNK_SIZE):
+                    if buffer is not None:
+                        buffer.write(chunk)
 
-        return tasks
+                    await loop.run_in_executor(None, file.write, chunk)
+            finally:
+                await loop.run_in_executor(None, file.close)
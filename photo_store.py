@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+import async_fs
+import config
+from storage_redis import StorageRedis
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'photo_store:'
+
+
+class PhotoStore:
+    """
+    Photos by their content id (telegram's file_unique_id): the file on
+    disk, the permanent telegra.ph url and the recognized numberplates, so
+    a photo sent again isn't downloaded, uploaded and recognized again.
+
+    The appeal folders get hardlinks to the stored file, the number of
+    links is the reference counter: collect() removes the photos nobody
+    links to anymore.
+    """
+    @classmethod
+    async def create(cls, files_dir: str):
+        self = PhotoStore(files_dir)
+        self._redis = await StorageRedis.create(PREFIX)
+        return self
+
+    def __init__(self, files_dir: str):
+        # hardlinks need the same filesystem as the appeal folders
+        self.store_dir = os.path.join(files_dir, config.PHOTO_STORE_DIR)
+        self._redis: StorageRedis
+        self._locks: Dict[str, asyncio.Lock] = dict()
+
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path(self, photo_id: str) -> str:
+        return os.path.join(self.store_dir, photo_id)
+
+    async def get(self, photo_id: Optional[str]) -> dict:
+        """
+        Everything known about the photo, the file is there if the record
+        has the path.
+        """
+        if not photo_id:
+            return dict()
+
+        record: dict = await self._redis.get_value(photo_id, dict())
+
+        if not await async_fs.exists(self._path(photo_id)):
+            record.pop('path', None)
+
+        return record
+
+    async def link(self, record: dict, file_path: str) -> bool:
+        try:
+            await async_fs.link(record['path'], file_path)
+            return True
+        except (KeyError, OSError):
+            logger.exception(f'Failed to link stored photo to {file_path}')
+            return False
+
+    async def add_file(self, photo_id: Optional[str], file_path: str):
+        if not photo_id:
+            return
+
+        stored_path = self._path(photo_id)
+
+        try:
+            await async_fs.link(file_path, stored_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            logger.exception(f'Failed to store photo {file_path}')
+            return
+
+        await self._update(photo_id, path=stored_path)
+
+    async def add_url(self, photo_id: Optional[str], url: str):
+        if photo_id:
+            await self._update(photo_id, url=url)
+
+    async def add_numberplates(self,
+                               photo_id: Optional[str],
+                               numberplates: List[str]):
+        if photo_id:
+            await self._update(photo_id, numberplates=numberplates)
+
+    async def _update(self, photo_id: str, **fields):
+        lock = self._locks.setdefault(photo_id, asyncio.Lock())
+
+        async with lock:
+            record: dict = await self._redis.get_value(photo_id, dict())
+            record.update(fields)
+
+            # the files don't outlive a restart, the records expire on
+            # their own
+            await self._redis.set_value(photo_id,
+                                        record,
+                                        config.PHOTO_STORE_RECORD_TTL)
+
+    async def collect(self) -> int:
+        """
+        Removes the photos that are not linked to any appeal folder.
+        """
+        loop = asyncio.get_event_loop()
+        unused = await loop.run_in_executor(None, self._unlink_unused)
+
+        if unused:
+            await self._redis.delete(*unused)
+
+        for photo_id in unused:
+            self._locks.pop(photo_id, None)
+
+        return len(unused)
+
+    def _unlink_unused(self) -> List[str]:
+        unused = list()
+
+        with os.scandir(self.store_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_nlink <= 1:
+                        os.unlink(entry.path)
+                        unused.append(entry.name)
+                except FileNotFoundError:
+                    pass
+
+        return unused
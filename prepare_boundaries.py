@@ -0,0 +1,285 @@
+"""
+Prepares the simplified regions boundaries dataset for Locator.
+
+    python prepare_boundaries.py --tolerance 0.0002
+    python prepare_boundaries.py --source download --samples 200000
+
+Boundaries are taken from the bot's on-disk cache or downloaded from
+Nominatim, simplified with Douglas-Peucker and saved to
+config.BOUNDARIES_DATASET_PATH. The accuracy report shows how many random
+points are routed to another region after the simplification.
+"""
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import requests
+
+import config
+import territory
+from boundary_cache import BoundaryCache
+from region_index import RegionIndex
+
+NOMINATIM_URL = 'https://nominatim.openstreetmap.org/search'
+DATASET_REVISION_FORMAT = '%Y%m%d%H%M%S'
+
+
+def point_to_segment_distance(point: list, start: list, end: list) -> float:
+    x, y = point[0], point[1]
+    x1, y1 = start[0], start[1]
+    x2, y2 = end[0], end[1]
+    dx, dy = x2 - x1, y2 - y1
+
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+
+    share = ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)
+    share = min(max(share, 0.0), 1.0)
+    return ((x - x1 - share * dx) ** 2 + (y - y1 - share * dy) ** 2) ** 0.5
+
+
+def douglas_peucker(line: list, tolerance: float) -> list:
+    """
+    Iterative, so the rings with tens of thousands of vertices don't hit
+    the recursion limit.
+    """
+    keep = [False] * len(line)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(line) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        farthest = 0.0
+        farthest_index = first
+
+        for index in range(first + 1, last):
+            distance = point_to_segment_distance(line[index],
+                                                 line[first],
+                                                 line[last])
+
+            if distance > farthest:
+                farthest = distance
+                farthest_index = index
+
+        if farthest > tolerance:
+            keep[farthest_index] = True
+            stack.append((first, farthest_index))
+            stack.append((farthest_index, last))
+
+    return [point for point, kept in zip(line, keep) if kept]
+
+
+def simplify_ring(ring: list, tolerance: float) -> list:
+    """
+    Closed ring is split at the vertex farthest from the first one,
+    otherwise Douglas-Peucker would work with a zero length segment.
+    """
+    if len(ring) < 5:
+        return ring
+
+    start = ring[0]
+    middle = max(range(len(ring)),
+                 key=lambda index: point_to_segment_distance(ring[index],
+                                                             start,
+                                                             start))
+
+    head = douglas_peucker(ring[:middle + 1], tolerance)
+    tail = douglas_peucker(ring[middle:], tolerance)
+    simplified = head + tail[1:]
+
+    if len(simplified) < 4:
+        return ring
+
+    return simplified
+
+
+def simplify(boundary: list, tolerance: float) -> list:
+    if not boundary or not boundary[0]:
+        return boundary
+
+    if isinstance(boundary[0][0], list):
+        return [simplify(part, tolerance) for part in boundary]
+
+    return simplify_ring(boundary, tolerance)
+
+
+def vertices_count(boundary: list) -> int:
+    if not boundary or not boundary[0]:
+        return 0
+
+    if isinstance(boundary[0][0], list):
+        return sum(vertices_count(part) for part in boundary)
+
+    return len(boundary)
+
+
+def download(regions: List[str]) -> Dict[str, list]:
+    boundaries = dict()
+
+    for region in regions:
+        params = {
+            'format': 'json',
+            'q': config.OSM_REGIONS[region],
+            'polygon_geojson': 1,
+        }
+
+        headers = {'User-Agent': config.NOMINATIM_USER_AGENT}
+
+        response = requests.get(NOMINATIM_URL,
+                                params=params,
+                                headers=headers,
+                                timeout=60)
+
+        response.raise_for_status()
+        boundaries[region] = response.json()[0]['geojson']['coordinates'][0]
+        print(f'downloaded {region}')
+
+        # usage policy of nominatim: no more than a request per second
+        time.sleep(config.NOMINATIM_REQUEST_INTERVAL)
+
+    return boundaries
+
+
+def read_cache(path: str) -> Dict[str, list]:
+    return {
+        region: entry['boundary']
+        for region, entry in BoundaryCache(path).load().items()
+        if entry['boundary']
+    }
+
+
+def resolve(index: Dict[str, RegionIndex],
+            longitude: float,
+            latitude: float,
+            parent: Optional[str] = None) -> Optional[str]:
+    for region in territory.regions(parent):
+        if region in index and index[region].contains(longitude, latitude):
+            if territory.has_subregions(region):
+                return resolve(index, longitude, latitude, region)
+            else:
+                return region
+
+    return None
+
+
+def sample_points(index: Dict[str, RegionIndex], amount: int) -> List[list]:
+    """
+    Half of the points are in Minsk where the most of violations are,
+    the rest are spread over the whole country.
+    """
+    rnd = random.Random(0)
+    country = list(index.values())
+    minsk = index.get(config.MINSK)
+    points = []
+
+    min_lon = min(region.min_lon for region in country)
+    max_lon = max(region.max_lon for region in country)
+    min_lat = min(region.min_lat for region in country)
+    max_lat = max(region.max_lat for region in country)
+
+    for number in range(amount):
+        if minsk and minsk.areas and number % 2:
+            points.append([rnd.uniform(minsk.min_lon, minsk.max_lon),
+                           rnd.uniform(minsk.min_lat, minsk.max_lat)])
+        else:
+            points.append([rnd.uniform(min_lon, max_lon),
+                           rnd.uniform(min_lat, max_lat)])
+
+    return points
+
+
+def report(original: Dict[str, list],
+           simplified: Dict[str, list],
+           samples: int) -> int:
+    print(f'{"region":>16} {"vertices":>10} {"simplified":>10}')
+
+    for region in original:
+        print(f'{region:>16} {vertices_count(original[region]):>10} ' +
+              f'{vertices_count(simplified[region]):>10}')
+
+    original_index = {region: RegionIndex(boundary)
+                      for region, boundary in original.items()}
+
+    simplified_index = {region: RegionIndex(boundary)
+                        for region, boundary in simplified.items()}
+
+    changes = Counter()
+
+    for longitude, latitude in sample_points(original_index, samples):
+        before = resolve(original_index, longitude, latitude)
+        after = resolve(simplified_index, longitude, latitude)
+
+        if before != after:
+            changes[(before, after)] += 1
+
+    changed = sum(changes.values())
+    print(f'\nchanged region: {changed} of {samples} sample points ' +
+          f'({100 * changed / samples:.4f}%)')
+
+    for (before, after), amount in changes.most_common():
+        print(f'{str(before):>16} -> {str(after):<16} {amount}')
+
+    return changed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--source',
+                        default=config.BOUNDARIES_CACHE_PATH,
+                        help='cache file or "download"')
+    parser.add_argument('--output', default=config.BOUNDARIES_DATASET_PATH)
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=0.0002,
+                        help='in degrees, 0.0002 is about 15-20 meters')
+    parser.add_argument('--samples', type=int, default=100000)
+    parser.add_argument('--max-changed',
+                        type=float,
+                        default=0.1,
+                        help='percent of changed points to refuse saving')
+    args = parser.parse_args()
+
+    if args.source == 'download':
+        original = download(list(config.OSM_REGIONS))
+    else:
+        original = read_cache(args.source)
+
+    missing = set(config.OSM_REGIONS) - set(original)
+
+    if missing:
+        print(f'no boundaries for {", ".join(sorted(missing))}')
+
+    if not original:
+        return 1
+
+    simplified = {region: simplify(boundary, args.tolerance)
+                  for region, boundary in original.items()}
+
+    changed = report(original, simplified, args.samples)
+
+    if 100 * changed / args.samples > args.max_changed:
+        print('too many points changed region, try smaller tolerance')
+        return 1
+
+    now = time.time()
+
+    regions = {
+        region: {'boundary': boundary, 'etag': None, 'updated': now}
+        for region, boundary in simplified.items()
+    }
+
+    revision = time.strftime(DATASET_REVISION_FORMAT, time.gmtime(now))
+
+    BoundaryCache(args.output).save(regions,
+                                    revision=revision,
+                                    tolerance=args.tolerance)
+
+    print(f'saved {args.output}, revision {revision}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
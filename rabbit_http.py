@@ -1,6 +1,6 @@
 from typing import Optional
-import aiohttp
 import config
+import http_client
 import json
 from exceptions import *
 
@@ -24,11 +24,12 @@ class Rabbit:
             'payload_encoding': 'string'
         }
 
-        async with aiohttp.ClientSession() as http_session:
-            async with http_session.post(url, json=data) as response:
-                if response.status != 200:
-                    raise ErrorWhilePutInQueue(
-                        f'Ошибка при отправке обращения: {response.reason}')
+        http_session = http_client.session(http_client.RABBIT)
+
+        async with http_session.post(url, json=data) as response:
+            if response.status != 200:
+                raise ErrorWhilePutInQueue(
+                    f'Ошибка при отправке обращения: {response.reason}')
 
     async def send_appeal(self,
                           appeal: dict,
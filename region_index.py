@@ -0,0 +1,265 @@
+import math
+from typing import Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# сколько в среднем ребер полигона попадает в одну полосу сетки
+EDGES_PER_BUCKET = 8
+
+# для векторного движка полосы шире: на каждую полосу один вызов numpy
+EDGES_PER_STRIPE = 128
+
+Edge = Tuple[float, float, float, float]
+Vertical = Tuple[float, float, float]
+
+
+def rings(boundary: list) -> Iterator[list]:
+    """Если регион разбит на части, то будем возвращать каждую"""
+    if not boundary or not boundary[0]:
+        return
+
+    if isinstance(boundary[0][0], list):
+        for part in boundary:
+            yield from rings(part)
+    else:
+        yield boundary
+
+
+class AreaIndex:
+    """
+    Precompiled polygon ring: bounding box plus edges bucketed into
+    longitude stripes, so a containment test looks only at the edges
+    that can be crossed by the vertical ray from the point.
+
+    With NumPy installed the edges are also kept in contiguous float64
+    arrays for the batch test.
+    """
+    __slots__ = ('min_lon', 'min_lat', 'max_lon', 'max_lat',
+                 '_bucket_width', '_buckets', '_verticals',
+                 '_stripe_width', '_stripes')
+
+    def __init__(self, ring: list):
+        longitudes = [point[0] for point in ring]
+        latitudes = [point[1] for point in ring]
+
+        self.min_lon = min(longitudes)
+        self.max_lon = max(longitudes)
+        self.min_lat = min(latitudes)
+        self.max_lat = max(latitudes)
+
+        edges, self._verticals = self._edges(ring)
+        buckets_amount = max(1, len(edges) // EDGES_PER_BUCKET)
+        width = (self.max_lon - self.min_lon) / buckets_amount
+
+        self._bucket_width = width or 1.0
+        self._buckets: List[List[Edge]] = [[] for _ in range(buckets_amount)]
+
+        last_bucket = buckets_amount - 1
+
+        for edge in edges:
+            left, right = sorted((edge[0], edge[1]))
+            first = min(int((left - self.min_lon) / self._bucket_width),
+                        last_bucket)
+            last = min(int((right - self.min_lon) / self._bucket_width),
+                       last_bucket)
+
+            for bucket in range(first, last + 1):
+                self._buckets[bucket].append(edge)
+
+        if np is not None:
+            self._compile_stripes(edges)
+
+    def _compile_stripes(self, edges: List[Edge]) -> None:
+        """
+        Stripe is a (4, n) float64 array of x1, x2, y1 and slope rows.
+        """
+        stripes_amount = max(1, len(edges) // EDGES_PER_STRIPE)
+        width = (self.max_lon - self.min_lon) / stripes_amount
+        self._stripe_width = width or 1.0
+
+        table = np.array(edges, dtype=np.float64).reshape(-1, 4).T
+        left = np.minimum(table[0], table[1])
+        right = np.maximum(table[0], table[1])
+        first = self._stripes_of(left, stripes_amount)
+        last = self._stripes_of(right, stripes_amount)
+
+        self._stripes = [
+            np.ascontiguousarray(
+                table[:, (first <= stripe) & (last >= stripe)])
+            for stripe in range(stripes_amount)
+        ]
+
+    def _stripes_of(self, longitudes, stripes_amount: int):
+        stripes = np.floor((longitudes - self.min_lon) / self._stripe_width)
+        return np.clip(stripes, 0, stripes_amount - 1).astype(np.intp)
+
+    @staticmethod
+    def _edges(ring: list) -> Tuple[List[Edge], List[Vertical]]:
+        """
+        Edge is (x1, x2, y1, slope). Vertical edges are never crossed by
+        the ray so they are kept apart as (x, y_low, y_high), only the box
+        test needs them.
+        """
+        edges = []
+        verticals = []
+        previous = ring[-1]
+
+        for current in ring:
+            x1, y1 = previous[0], previous[1]
+            x2, y2 = current[0], current[1]
+
+            if x1 != x2:
+                edges.append((x1, x2, y1, (y2 - y1) / (x2 - x1)))
+            elif y1 != y2:
+                verticals.append((x1, min(y1, y2), max(y1, y2)))
+
+            previous = current
+
+        return edges, verticals
+
+    def _bucket(self, longitude: float) -> int:
+        bucket = math.floor((longitude - self.min_lon) / self._bucket_width)
+        return min(max(bucket, 0), len(self._buckets) - 1)
+
+    def in_bbox(self, longitude: float, latitude: float) -> bool:
+        return (self.min_lon <= longitude < self.max_lon and
+                self.min_lat <= latitude <= self.max_lat)
+
+    def contains(self, longitude: float, latitude: float) -> bool:
+        if not self.in_bbox(longitude, latitude):
+            return False
+
+        overlap = False
+
+        for x1, x2, y1, slope in self._buckets[self._bucket(longitude)]:
+            if (((x1 > longitude) != (x2 > longitude)) and
+                    (latitude < slope * (longitude - x1) + y1)):
+                overlap = not overlap
+
+        return overlap
+
+    def crosses_box(self,
+                    min_lon: float,
+                    min_lat: float,
+                    max_lon: float,
+                    max_lat: float) -> bool:
+        """
+        True if any edge of the ring touches the box, otherwise the whole
+        box is either inside or outside of the ring.
+        """
+        if (max_lon < self.min_lon or min_lon > self.max_lon or
+                max_lat < self.min_lat or min_lat > self.max_lat):
+            return False
+
+        for x, y_low, y_high in self._verticals:
+            if (min_lon <= x <= max_lon and
+                    y_low <= max_lat and y_high >= min_lat):
+                return True
+
+        for bucket in range(self._bucket(min_lon), self._bucket(max_lon) + 1):
+            for x1, x2, y1, slope in self._buckets[bucket]:
+                left = max(min(x1, x2), min_lon)
+                right = min(max(x1, x2), max_lon)
+
+                if left > right:
+                    continue
+
+                y_left = slope * (left - x1) + y1
+                y_right = slope * (right - x1) + y1
+
+                if (min(y_left, y_right) <= max_lat and
+                        max(y_left, y_right) >= min_lat):
+                    return True
+
+        return False
+
+    def bbox_mask(self, longitudes, latitudes):
+        return ((longitudes >= self.min_lon) & (longitudes < self.max_lon) &
+                (latitudes >= self.min_lat) & (latitudes <= self.max_lat))
+
+    def contains_many(self, longitudes, latitudes):
+        """
+        Vectorized contains() over float64 arrays, needs NumPy.
+        Returns boolean array.
+        """
+        inside = np.zeros(len(longitudes), dtype=bool)
+        candidates = np.flatnonzero(self.bbox_mask(longitudes, latitudes))
+
+        if not len(candidates):
+            return inside
+
+        lons = longitudes[candidates]
+        lats = latitudes[candidates]
+        point_stripes = self._stripes_of(lons, len(self._stripes))
+
+        for stripe in np.unique(point_stripes):
+            selected = point_stripes == stripe
+            x1, x2, y1, slope = self._stripes[stripe]
+            lon = lons[selected][:, np.newaxis]
+            lat = lats[selected][:, np.newaxis]
+
+            crossed = (((x1 > lon) != (x2 > lon)) &
+                       (lat < slope * (lon - x1) + y1))
+
+            crossings = np.count_nonzero(crossed, axis=1)
+            inside[candidates[selected]] = crossings % 2 == 1
+
+        return inside
+
+
+class RegionIndex:
+    """
+    All the areas of a single region behind the common bounding box.
+    """
+    __slots__ = ('areas', 'min_lon', 'min_lat', 'max_lon', 'max_lat')
+
+    def __init__(self, boundary: list):
+        self.areas = [AreaIndex(ring) for ring in rings(boundary) if ring]
+
+        if self.areas:
+            self.min_lon = min(area.min_lon for area in self.areas)
+            self.max_lon = max(area.max_lon for area in self.areas)
+            self.min_lat = min(area.min_lat for area in self.areas)
+            self.max_lat = max(area.max_lat for area in self.areas)
+        else:
+            self.min_lon = self.min_lat = math.inf
+            self.max_lon = self.max_lat = -math.inf
+
+    def contains(self, longitude: float, latitude: float) -> bool:
+        if not (self.min_lon <= longitude < self.max_lon and
+                self.min_lat <= latitude <= self.max_lat):
+            return False
+
+        for area in self.areas:
+            if area.contains(longitude, latitude):
+                return True
+
+        return False
+
+    def crosses_box(self,
+                    min_lon: float,
+                    min_lat: float,
+                    max_lon: float,
+                    max_lat: float) -> bool:
+        if (max_lon < self.min_lon or min_lon > self.max_lon or
+                max_lat < self.min_lat or min_lat > self.max_lat):
+            return False
+
+        for area in self.areas:
+            if area.crosses_box(min_lon, min_lat, max_lon, max_lat):
+                return True
+
+        return False
+
+    def contains_many(self, longitudes, latitudes):
+        inside = np.zeros(len(longitudes), dtype=bool)
+
+        for area in self.areas:
+            outside = np.flatnonzero(~inside)
+            inside[outside] = area.contains_many(longitudes[outside],
+                                                 latitudes[outside])
+
+        return inside
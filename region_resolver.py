@@ -0,0 +1,103 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import geohash
+import territory
+from region_index import RegionIndex
+
+# ячейка пересекается границей, нужна точная проверка
+BOUNDARY = object()
+MISSING = object()
+
+
+class RegionResolver:
+    """
+    Region lookup memoized by geohash cells. A cell that lies fully inside
+    of a single region (or outside of all of them) is answered from the
+    LRU table without any polygon math, only the cells crossed by
+    a boundary fall through to the exact test.
+    """
+    def __init__(self,
+                 index: Dict[str, RegionIndex],
+                 precision: int,
+                 cache_size: int):
+        self._index = index
+        self._cells: OrderedDict = OrderedDict()
+        self.precision = precision
+        self._cell_width, self._cell_height = geohash.cell_size(precision)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.exact = 0
+
+    def clear(self) -> None:
+        self._cells.clear()
+
+    def resolve(self,
+                longitude: float,
+                latitude: float,
+                parent: Optional[str] = None) -> Optional[str]:
+        if parent is not None:
+            return self._walk(longitude, latitude, parent)[0]
+
+        cell = (int((longitude + 180.0) // self._cell_width),
+                int((latitude + 90.0) // self._cell_height))
+
+        cached = self._cells.get(cell, MISSING)
+
+        if cached is BOUNDARY:
+            self._cells.move_to_end(cell)
+            self.exact += 1
+            return self._walk(longitude, latitude)[0]
+
+        if cached is not MISSING:
+            self._cells.move_to_end(cell)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        box = geohash.cell_bounds(cell, self.precision)
+        region, uniform = self._walk(longitude, latitude, box=box)
+        self._cells[cell] = region if uniform else BOUNDARY
+
+        if len(self._cells) > self.cache_size:
+            self._cells.popitem(last=False)
+
+        return region
+
+    def _walk(self,
+              longitude: float,
+              latitude: float,
+              parent: Optional[str] = None,
+              box: Optional[Tuple[float, float, float, float]] = None
+              ) -> Tuple[Optional[str], bool]:
+        """
+        Returns the region and whether the answer is the same for every
+        point of the box. Regions are checked in order and the first one
+        wins, so the box is uniform only if no boundary checked on the way
+        crosses it.
+        """
+        uniform = True
+
+        for region in territory.regions(parent):
+            index = self._index.get(region)
+
+            if index is None:
+                continue
+
+            if box and uniform and index.crosses_box(*box):
+                uniform = False
+
+            if index.contains(longitude, latitude):
+                if territory.has_subregions(region):
+                    found, inner_uniform = self._walk(
+                        longitude,
+                        latitude,
+                        region,
+                        box if uniform else None)
+
+                    return found, uniform and inner_uniform
+                else:
+                    return region, uniform
+
+        return None, uniform
@@ -2,7 +2,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 import json
 
-import aiohttp
+import http_client
 
 from bot_storage import BotStorage
 import config
@@ -22,14 +22,15 @@ class Statistic():
             f'{config.RABBIT_HOST}:{config.RABBIT_HTTP_PORT}/' + \
             f'api/queues/%2F/{config.RABBIT_QUEUE_APPEALS}'
 
-        async with aiohttp.ClientSession() as http_session:
-            async with http_session.get(url) as response:
-                if response.status != 200:
-                    return 777
+        http_session = http_client.session(http_client.RABBIT)
 
-                queue_data = await response.json()
-                messages_count: int = queue_data.get('messages', 888)
-                return messages_count
+        async with http_session.get(url) as response:
+            if response.status != 200:
+                return 777
+
+            queue_data = await response.json()
+            messages_count: int = queue_data.get('messages', 888)
+            return messages_count
 
     async def get_appeals_sent_count(self) -> int:
         return await self._bot_storage.get_appeals_count()
@@ -1,6 +1,8 @@
+import asyncio
 import json
 import logging
-from typing import Any, Callable
+from contextlib import asynccontextmanager
+from typing import Any, Callable, List, Optional, Tuple
 
 import aioredis
 
@@ -8,6 +10,61 @@ import config
 
 logger = logging.getLogger(__name__)
 
+# connections shared by all the storages of the process
+_pool: Optional[aioredis.Redis] = None
+
+# adds the members ARGV[2] (json list) to the json list in the field ARGV[1]
+# of the hash KEYS[1], the ones that are there already are skipped unless
+# ARGV[3] is '1'
+ADD_MEMBERS_SCRIPT = """
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+local members = raw and cjson.decode(raw) or {}
+local repeats = ARGV[3] == '1'
+local seen = {}
+
+for _, member in ipairs(members) do
+    seen[member] = true
+end
+
+for _, member in ipairs(cjson.decode(ARGV[2])) do
+    if repeats or not seen[member] then
+        table.insert(members, member)
+        seen[member] = true
+    end
+end
+
+redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(members))
+"""
+
+# moves the hash KEYS[1] to KEYS[2], ARGV[1] is replaced by ARGV[2] in the
+# strings of the list fields
+MOVE_HASH_SCRIPT = """
+local old = ARGV[1]:gsub('%p', '%%%0')
+local new = ARGV[2]:gsub('%%', '%%%%')
+local fields = redis.call('HGETALL', KEYS[1])
+
+redis.call('DEL', KEYS[2])
+
+for i = 1, #fields, 2 do
+    local value = fields[i + 1]
+    local decoded = cjson.decode(value)
+
+    if ARGV[1] ~= '' and type(decoded) == 'table' then
+        for j, member in ipairs(decoded) do
+            if type(member) == 'string' then
+                decoded[j] = member:gsub(old, new)
+            end
+        end
+
+        value = cjson.encode(decoded)
+    end
+
+    redis.call('HSET', KEYS[2], fields[i], value)
+end
+
+redis.call('DEL', KEYS[1])
+"""
+
 
 def safe_redis(func: Callable) -> Callable:
     async def try_function(*args, default=None):
@@ -23,6 +80,57 @@ def safe_redis(func: Callable) -> Callable:
     return try_function
 
 
+async def shared_redis() -> aioredis.Redis:
+    global _pool
+
+    if _pool is None or _pool.closed:
+        pool = await aioredis.create_redis_pool(
+            f'redis://{config.REDIS_HOST}:{config.REDIS_PORT}',
+            password=config.REDIS_PASSWORD,
+            minsize=config.REDIS_POOL_MIN_SIZE,
+            maxsize=config.REDIS_POOL_MAX_SIZE)
+
+        # someone else could create it meanwhile
+        if _pool is None or _pool.closed:
+            _pool = pool
+        else:
+            pool.close()
+            await pool.wait_closed()
+
+    return _pool
+
+
+async def close_shared_redis() -> None:
+    if _pool is not None and not _pool.closed:
+        _pool.close()
+        await _pool.wait_closed()
+
+
+def decode_value(raw_value: Optional[bytes], default: Any) -> Any:
+    # nil for the missing key, no need to ask if it exists first
+    if raw_value is None:
+        return default
+
+    return json.loads(raw_value) or default
+
+
+def decode_set(raw_values: list, default: Any) -> Any:
+    # the missing key is an empty set
+    value = list(map(lambda raw_value: raw_value.decode('utf8'),
+                     raw_values))
+
+    return value or default
+
+
+def decode_fields(raw_fields: dict, default: Any) -> Any:
+    fields = {
+        field.decode('utf8'): json.loads(raw_value)
+        for field, raw_value in raw_fields.items()
+    }
+
+    return fields or default
+
+
 class StorageRedis:
     """
     Functions to safe read/write to redis
@@ -30,33 +138,41 @@ class StorageRedis:
     @classmethod
     async def create(cls, prefix: str):
         self = StorageRedis(prefix)
-
-        self._redis = await aioredis.create_redis(
-            f'redis://{config.REDIS_HOST}:{config.REDIS_PORT}',
-            password=config.REDIS_PASSWORD)
-
+        self._redis = await shared_redis()
         return self
 
     def __init__(self, prefix: str):
         self.PREFIX = prefix
-        self._redis: aioredis = None
+        self._redis: aioredis.Redis = None
+
+    @asynccontextmanager
+    async def pipeline(self):
+        """
+        The commands of the block are sent together when it ends, the calls
+        return the futures of their results.
+        """
+        pipeline = StoragePipeline(self.PREFIX, self._redis.pipeline())
+
+        try:
+            yield pipeline
+        except BaseException:
+            # nothing is sent if the block fails
+            pipeline.discard()
+            raise
+
+        await pipeline.execute()
 
     @safe_redis
     async def get_value(self, key: str, default: Any = dict()) -> Any:
         key = self.PREFIX + key
-
-        if await self._redis.exists(key):
-            raw_value = await self._redis.get(key)
-            value: dict = json.loads(raw_value)
-            return value or default
-        else:
-            return default
+        raw_value = await self._redis.get(key)
+        return decode_value(raw_value, default)
 
     @safe_redis
-    async def set_value(self, key: str, value: Any):
+    async def set_value(self, key: str, value: Any, expire: int = 0):
         key = self.PREFIX + key
         raw_value = json.dumps(value)
-        await self._redis.set(key, raw_value)
+        await self._redis.set(key, raw_value, expire=expire)
 
     @safe_redis
     async def add_set_member(self, key: str, value: Any, *values):
@@ -67,16 +183,81 @@ class StorageRedis:
     @safe_redis
     async def get_set(self, key: str, default: Any = ()) -> Any:
         key = self.PREFIX + key
+        raw_values = await self._redis.smembers(key)
+        return decode_set(raw_values, default)
 
-        if await self._redis.exists(key):
-            raw_values = await self._redis.smembers(key)
+    @safe_redis
+    async def get_field(self,
+                        key: str,
+                        field: str,
+                        default: Any = dict()) -> Any:
+        key = self.PREFIX + key
+        raw_value = await self._redis.hget(key, field)
+        return decode_value(raw_value, default)
 
-            value = list(map(lambda raw_value: raw_value.decode('utf8'),
-                             raw_values))
+    @safe_redis
+    async def get_fields(self, key: str, default: Any = dict()) -> Any:
+        key = self.PREFIX + key
+        raw_fields = await self._redis.hgetall(key)
+        return decode_fields(raw_fields, default)
 
-            return value or default
-        else:
-            return default
+    @safe_redis
+    async def set_field(self, key: str, field: str, value: Any):
+        key = self.PREFIX + key
+        await self._redis.hset(key, field, json.dumps(value))
+
+    @safe_redis
+    async def add_field_members(self,
+                                key: str,
+                                field: str,
+                                value: Any,
+                                *values):
+        """
+        The field is a list without repeats, like a set that keeps the
+        order.
+        """
+        key = self.PREFIX + key
+        members = json.dumps([value, *values])
+
+        await self._redis.eval(ADD_MEMBERS_SCRIPT,
+                               keys=[key],
+                               args=[field, members, '0'])
+
+    @safe_redis
+    async def append_field_items(self,
+                                 key: str,
+                                 field: str,
+                                 value: Any,
+                                 *values):
+        """
+        The field is a list, the repeats are kept.
+        """
+        key = self.PREFIX + key
+        items = json.dumps([value, *values])
+
+        await self._redis.eval(ADD_MEMBERS_SCRIPT,
+                               keys=[key],
+                               args=[field, items, '1'])
+
+    @safe_redis
+    async def delete_fields(self, key: str, field: str, *fields):
+        key = self.PREFIX + key
+        await self._redis.hdel(key, field, *fields)
+
+    @safe_redis
+    async def move_fields(self,
+                          source: str,
+                          target: str,
+                          old: str = '',
+                          new: str = ''):
+        """
+        Atomically moves the hash, replacing old with new in the strings of
+        its lists.
+        """
+        await self._redis.eval(MOVE_HASH_SCRIPT,
+                               keys=[self.PREFIX + source,
+                                     self.PREFIX + target],
+                               args=[old, new])
 
     @safe_redis
     async def delete(self, key: str, *keys):
@@ -84,14 +265,152 @@ class StorageRedis:
         keys = map(lambda key: self.PREFIX + key, keys)
         await self._redis.delete(*keys)
 
+    @safe_redis
+    async def key_type(self, key: str) -> str:
+        key = self.PREFIX + key
+        return (await self._redis.type(key)).decode('utf8')
+
     @safe_redis
     async def keys(self, pattern: str):
         pattern = self.PREFIX + pattern
-        return await self._redis.keys(pattern)
+        keys = list()
+
+        # SCAN doesn't block the server like KEYS does
+        async for key in self._redis.iscan(match=pattern,
+                                           count=config.REDIS_SCAN_COUNT):
+            keys.append(key)
+
+        return keys
 
     @safe_redis
     async def delete_by_pattern(self, pattern: str):
-        keys = await self.keys(pattern)
+        """
+        Deletes every batch of the keys as the scan finds it.
+        """
+        pattern = self.PREFIX + pattern
+        cursor = b'0'
+
+        while cursor:
+            cursor, keys = await self._redis.scan(
+                cursor,
+                match=pattern,
+                count=config.REDIS_SCAN_COUNT)
+
+            if keys:
+                await self._redis.delete(*keys)
+
+
+class StoragePipeline:
+    """
+    StorageRedis commands of one redis command each, batched into one round
+    trip. Every call returns the future of its result, the results are
+    there after execute().
+    """
+    def __init__(self, prefix: str, pipeline: aioredis.commands.Pipeline):
+        self.PREFIX = prefix
+        self._pipeline = pipeline
+        self._commands: List[Tuple[asyncio.Future,
+                                   asyncio.Future,
+                                   Optional[Callable],
+                                   Any]] = list()
+
+    def _add(self,
+             command: asyncio.Future,
+             decode: Optional[Callable] = None,
+             default: Any = None) -> asyncio.Future:
+        result = asyncio.get_event_loop().create_future()
+        self._commands.append((command, result, decode, default))
+        return result
+
+    def get_value(self, key: str, default: Any = dict()):
+        command = self._pipeline.get(self.PREFIX + key)
+        return self._add(command, decode_value, default)
+
+    def set_value(self, key: str, value: Any, expire: int = 0):
+        command = self._pipeline.set(self.PREFIX + key,
+                                     json.dumps(value),
+                                     expire=expire)
+        return self._add(command)
+
+    def increment(self, key: str, amount: int = 1, expire: int = 0):
+        command = self._pipeline.incrby(self.PREFIX + key, amount)
+
+        if expire:
+            self._pipeline.expire(self.PREFIX + key, expire)
+
+        return self._add(command)
+
+    def add_set_member(self, key: str, value: Any, *values):
+        command = self._pipeline.sadd(self.PREFIX + key, value, *values)
+        return self._add(command)
+
+    def get_set(self, key: str, default: Any = ()):
+        command = self._pipeline.smembers(self.PREFIX + key)
+        return self._add(command, decode_set, default)
+
+    def get_field(self, key: str, field: str, default: Any = dict()):
+        command = self._pipeline.hget(self.PREFIX + key, field)
+        return self._add(command, decode_value, default)
+
+    def get_fields(self, key: str, default: Any = dict()):
+        command = self._pipeline.hgetall(self.PREFIX + key)
+        return self._add(command, decode_fields, default)
+
+    def set_field(self, key: str, field: str, value: Any):
+        command = self._pipeline.hset(self.PREFIX + key,
+                                      field,
+                                      json.dumps(value))
+        return self._add(command)
+
+    def add_field_members(self, key: str, field: str, value: Any, *values):
+        members = json.dumps([value, *values])
+        command = self._pipeline.eval(ADD_MEMBERS_SCRIPT,
+                                      keys=[self.PREFIX + key],
+                                      args=[field, members, '0'])
+        return self._add(command)
+
+    def append_field_items(self, key: str, field: str, value: Any, *values):
+        items = json.dumps([value, *values])
+        command = self._pipeline.eval(ADD_MEMBERS_SCRIPT,
+                                      keys=[self.PREFIX + key],
+                                      args=[field, items, '1'])
+        return self._add(command)
+
+    def delete_fields(self, key: str, field: str, *fields):
+        command = self._pipeline.hdel(self.PREFIX + key, field, *fields)
+        return self._add(command)
+
+    def move_fields(self,
+                    source: str,
+                    target: str,
+                    old: str = '',
+                    new: str = ''):
+        command = self._pipeline.eval(MOVE_HASH_SCRIPT,
+                                      keys=[self.PREFIX + source,
+                                            self.PREFIX + target],
+                                      args=[old, new])
+        return self._add(command)
+
+    def delete(self, key: str, *keys):
+        keys = (*keys, key)
+        command = self._pipeline.delete(*(self.PREFIX + key for key in keys))
+        return self._add(command)
+
+    async def execute(self):
+        try:
+            await self._pipeline.execute()
+        except Exception:
+            logger.exception("Что-то не так с хранилищем")
+
+        for command, result, decode, default in self._commands:
+            if not command.done() or command.cancelled() or \
+                    command.exception():
+                result.set_result(default)
+            elif decode:
+                result.set_result(decode(command.result(), default))
+            else:
+                result.set_result(command.result())
 
-        if keys:
-            await self._redis.delete(*keys)
+    def discard(self):
+        for _, result, _, default in self._commands:
+            result.set_result(default)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import random
+import secrets
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+import config
+import http_client
+from limiter import UPLOAD, Limiter
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_URL = 'https://telegra.ph/upload'
+
+Upload = Tuple[bytes, asyncio.Future]
+
+
+class UploadError(Exception):
+    pass
+
+
+class RetryBudget:
+    """
+    Retries are allowed for a share of the requests only, so a degraded
+    telegra.ph isn't hit with the retries of every upload at once.
+    """
+    def __init__(self, ratio: float, minimum: int):
+        self.ratio = ratio
+        self.maximum = minimum * 2
+        self.tokens = float(minimum)
+
+    def deposit(self):
+        self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+
+class TelegraphUploader:
+    """
+    Uploads the photos of a user that come close in time with one
+    multipart request.
+    """
+    def __init__(self, limiter: Limiter):
+        self.limiter = limiter
+        self.budget = RetryBudget(config.TELEGRAPH_RETRY_BUDGET_RATIO,
+                                  config.TELEGRAPH_RETRY_BUDGET_MIN)
+        self._batches: Dict[int, List[Upload]] = dict()
+
+        self.requests = 0
+        self.uploaded = 0
+        self.retries = 0
+        self.fallbacks = 0
+
+    async def upload(self, user_id: int, content: bytes) -> Optional[str]:
+        """
+        Path of the uploaded file at telegra.ph or None if it failed.
+        """
+        future = asyncio.get_event_loop().create_future()
+        batch = self._batches.setdefault(user_id, list())
+        batch.append((content, future))
+
+        if len(batch) == 1:
+            asyncio.get_event_loop().call_later(
+                config.TELEGRAPH_UPLOAD_BATCH_DELAY, self._flush, user_id)
+        elif len(batch) >= config.TELEGRAPH_UPLOAD_BATCH_SIZE:
+            self._flush(user_id)
+
+        return await future
+
+    def _flush(self, user_id: int):
+        batch = self._batches.pop(user_id, None)
+
+        if batch:
+            asyncio.ensure_future(self._send(user_id, batch))
+
+    async def _send(self, user_id: int, batch: List[Upload]):
+        try:
+            paths = await self._post_with_retries(user_id, batch)
+        except UploadError:
+            # one bad file shouldn't fail the others
+            await asyncio.gather(*(self._send(user_id, [upload])
+                                   for upload in batch))
+            return
+        except Exception:
+            logger.exception('Failed to upload photos to telegra.ph')
+            paths = [None] * len(batch)
+
+        for (_, future), path in zip(batch, paths):
+            if path:
+                self.uploaded += 1
+            else:
+                self.fallbacks += 1
+
+            if not future.done():
+                future.set_result(path)
+
+    async def _post_with_retries(self,
+                                 user_id: int,
+                                 batch: List[Upload]) -> List[Optional[str]]:
+        """
+        Retries with exponential backoff while the budget allows. An error
+        of telegra.ph for several files is raised to upload them one by
+        one.
+        """
+        self.budget.deposit()
+        attempt = 0
+
+        while True:
+            try:
+                async with self.limiter.slot(UPLOAD, user_id):
+                    return await self._post(batch)
+            except UploadError as exc:
+                if len(batch) > 1:
+                    raise
+
+                error: Exception = exc
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                error = exc
+
+            if attempt + 1 >= config.TELEGRAPH_UPLOAD_TRIES or \
+                    not self.budget.withdraw():
+                logger.warning(f'Giving up uploading to telegra.ph: {error}')
+                return [None] * len(batch)
+
+            pause = random.uniform(
+                0,
+                min(config.TELEGRAPH_RETRY_MAX_PAUSE,
+                    config.TELEGRAPH_RETRY_PAUSE * 2 ** attempt))
+
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(pause)
+
+    async def _post(self, batch: List[Upload]) -> List[Optional[str]]:
+        form = aiohttp.FormData(quote_fields=False)
+
+        for content, _ in batch:
+            form.add_field(secrets.token_urlsafe(8),
+                           content,
+                           filename='file',
+                           content_type='image/jpg')
+
+        http_session = http_client.session(http_client.TELEGRAPH)
+        self.requests += 1
+
+        async with http_session.post(UPLOAD_URL, data=form) as response:
+            # the upstream failures are retried as they are
+            response.raise_for_status()
+
+            try:
+                result = await response.json(content_type=None)
+            except ValueError:
+                raise UploadError(await response.text())
+
+        if not isinstance(result, list) or len(result) != len(batch):
+            raise UploadError(result)
+
+        return [item.get('src') for item in result]
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'uploaded': self.uploaded,
+            'retries': self.retries,
+            'fallbacks': self.fallbacks,
+            'retry_budget': self.budget.tokens,
+        }
@@ -1,13 +1,23 @@
-from typing import Any
-from storage_redis import StorageRedis
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, Optional, Tuple
+
+from storage_redis import StoragePipeline, StorageRedis
 
 
 PREFIX = 'user_storage'
 
+# set when the keys of the groups are migrated to the hashes
+HASH_LAYOUT = 'hash_layout'
+
+# the key registries of the groups, the hashes don't need them
+REGISTRY = 'registry'
+
 
 class UserStorage:
     """
-    Stores miscellaneous user data
+    Stores miscellaneous user data. The data of a group, e.g. of an appeal
+    in "<appeal>:urls", is kept in one hash.
     """
     @classmethod
     async def create(cls, prefix):
@@ -18,18 +28,40 @@ class UserStorage:
 
     def __init__(self):
         self._redis: StorageRedis
+        self._migrated = False
+
+    @asynccontextmanager
+    async def pipeline(self):
+        """
+        UserStoragePipeline which commands are sent together when the block
+        ends.
+        """
+        async with self._redis.pipeline() as storage_pipeline:
+            yield UserStoragePipeline(self, storage_pipeline)
 
     async def get(self, user_id: int, key: str) -> Any:
-        composite_key = f'{str(user_id)}:{key}'
-        return await self._redis.get_value(composite_key)
+        group, field = self._split(user_id, key)
+
+        if field:
+            return await self._redis.get_field(group, field)
+
+        return await self._redis.get_value(group)
 
     async def set(self, user_id: int, key: str, value: Any):
-        composite_key = f'{str(user_id)}:{key}'
-        return await self._redis.set_value(composite_key, value)
+        group, field = self._split(user_id, key)
+
+        if field:
+            return await self._redis.set_field(group, field, value)
+
+        return await self._redis.set_value(group, value)
 
     async def get_full_set(self, user_id: int, key: str) -> Any:
-        composite_key = f'{str(user_id)}:{key}'
-        return await self._redis.get_set(composite_key)
+        group, field = self._split(user_id, key)
+
+        if field:
+            return await self._redis.get_field(group, field, ())
+
+        return await self._redis.get_set(group)
 
     async def add_set_member(self,
                              user_id: int,
@@ -39,13 +71,212 @@ class UserStorage:
         if value is None:
             return
 
-        composite_key = f'{str(user_id)}:{key}'
-        return await self._redis.add_set_member(composite_key, value, *values)
+        group, field = self._split(user_id, key)
+
+        if field:
+            return await self._redis.add_field_members(group,
+                                                       field,
+                                                       value,
+                                                       *values)
+
+        return await self._redis.add_set_member(group, value, *values)
+
+    async def append(self, user_id: int, key: str, value: Any = None, *values):
+        """
+        Like add_set_member, but the list of the group keeps the repeats, so
+        it stays in pairs with the other lists.
+        """
+        if value is None:
+            return
+
+        group, field = self._split(user_id, key)
+
+        if field:
+            return await self._redis.append_field_items(group,
+                                                        field,
+                                                        value,
+                                                        *values)
+
+        return await self._redis.add_set_member(group, value, *values)
+
+    async def get_group(self, user_id: int, group: str) -> dict:
+        """
+        All the data of the group with one command.
+        """
+        composite_key = f'{str(user_id)}:{group}'
+        return await self._redis.get_fields(composite_key, dict())
+
+    async def move(self,
+                   user_id: int,
+                   source: str,
+                   target: str,
+                   old: str = '',
+                   new: str = ''):
+        """
+        Moves the data of the source group to the target one, replacing old
+        with new in the lists.
+        """
+        return await self._redis.move_fields(f'{str(user_id)}:{source}',
+                                             f'{str(user_id)}:{target}',
+                                             old,
+                                             new)
 
     async def delete(self, user_id: int, key: str):
-        composite_key = f'{str(user_id)}:{key}'
-        return await self._redis.delete(composite_key)
+        group, field = self._split(user_id, key)
+
+        if field:
+            return await self._redis.delete_fields(group, field)
+
+        return await self._redis.delete(group)
 
     async def delete_by_pattern(self, user_id: int, pattern: str):
         composite_pattern = f'{str(user_id)}:{pattern}'
         await self._redis.delete_by_pattern(composite_pattern)
+
+    async def delete_group(self, user_id: int, group: str):
+        await self._redis.delete(f'{str(user_id)}:{group}')
+
+        if not self._migrated:
+            # the keys could be written before the hashes
+            await self.delete_by_pattern(user_id, f'{group}:*')
+
+    async def migrate(self):
+        """
+        Moves the keys "<user>:<group>:<name>" written before the hashes
+        into the fields of the groups, once.
+        """
+        if await self._redis.get_value(HASH_LAYOUT, False):
+            self._migrated = True
+            return
+
+        prefix_length = len(self._redis.PREFIX)
+        raw_keys = await self._redis.keys('*', default=None)
+
+        if raw_keys is None:
+            # the scan failed, try again next time
+            return
+
+        for raw_key in raw_keys:
+            composite_key = raw_key.decode('utf8')[prefix_length:]
+            user_id, _, key = composite_key.partition(':')
+            group, field = self._split(user_id, key)
+
+            if not field:
+                continue
+
+            if field != REGISTRY:
+                await self._migrate_key(composite_key, group, field)
+
+            await self._redis.delete(composite_key)
+
+        await self._redis.set_value(HASH_LAYOUT, True)
+        self._migrated = True
+
+    async def _migrate_key(self, composite_key: str, group: str, field: str):
+        key_type = await self._redis.key_type(composite_key)
+
+        if key_type == 'set':
+            if members := await self._redis.get_set(composite_key, ()):
+                await self._redis.add_field_members(group, field, *members)
+        elif key_type == 'string':
+            value = await self._redis.get_value(composite_key, None)
+            await self._redis.set_field(group, field, value)
+
+    def _split(self, user_id: Any, key: str) -> Tuple[str, Optional[str]]:
+        """
+        Hash and its field for the "<group>:<name>" key, the composite key
+        and no field for the rest.
+        """
+        if ':' not in key:
+            return f'{str(user_id)}:{key}', None
+
+        group, field = key.rsplit(':', 1)
+        return f'{str(user_id)}:{group}', field
+
+
+class UserStoragePipeline:
+    """
+    UserStorage commands that take one redis command each. Every call
+    returns the future of its result, the results are there when the
+    pipeline block ends.
+    """
+    def __init__(self, storage: UserStorage, pipeline: StoragePipeline):
+        self._storage = storage
+        self._pipeline = pipeline
+
+    def get(self, user_id: int, key: str) -> asyncio.Future:
+        group, field = self._storage._split(user_id, key)
+
+        if field:
+            return self._pipeline.get_field(group, field)
+
+        return self._pipeline.get_value(group)
+
+    def set(self, user_id: int, key: str, value: Any) -> asyncio.Future:
+        group, field = self._storage._split(user_id, key)
+
+        if field:
+            return self._pipeline.set_field(group, field, value)
+
+        return self._pipeline.set_value(group, value)
+
+    def get_full_set(self, user_id: int, key: str) -> asyncio.Future:
+        group, field = self._storage._split(user_id, key)
+
+        if field:
+            return self._pipeline.get_field(group, field, ())
+
+        return self._pipeline.get_set(group)
+
+    def add_set_member(self,
+                       user_id: int,
+                       key: str,
+                       value: Any,
+                       *values) -> asyncio.Future:
+        group, field = self._storage._split(user_id, key)
+
+        if field:
+            return self._pipeline.add_field_members(group,
+                                                    field,
+                                                    value,
+                                                    *values)
+
+        return self._pipeline.add_set_member(group, value, *values)
+
+    def append(self,
+               user_id: int,
+               key: str,
+               value: Any,
+               *values) -> asyncio.Future:
+        group, field = self._storage._split(user_id, key)
+
+        if field:
+            return self._pipeline.append_field_items(group,
+                                                     field,
+                                                     value,
+                                                     *values)
+
+        return self._pipeline.add_set_member(group, value, *values)
+
+    def get_group(self, user_id: int, group: str) -> asyncio.Future:
+        composite_key = f'{str(user_id)}:{group}'
+        return self._pipeline.get_fields(composite_key, dict())
+
+    def move(self,
+             user_id: int,
+             source: str,
+             target: str,
+             old: str = '',
+             new: str = '') -> asyncio.Future:
+        return self._pipeline.move_fields(f'{str(user_id)}:{source}',
+                                          f'{str(user_id)}:{target}',
+                                          old,
+                                          new)
+
+    def delete(self, user_id: int, key: str) -> asyncio.Future:
+        group, field = self._storage._split(user_id, key)
+
+        if field:
+            return self._pipeline.delete_fields(group, field)
+
+        return self._pipeline.delete(group)
@@ -1,50 +1,58 @@
-import aioredis
 import config
 import json
 
+from storage_redis import shared_redis
+
 
 async def verified():
-    redis = await aioredis.create_redis(
-        f'redis://{config.REDIS_HOST}:{config.REDIS_PORT}',
-        password=config.REDIS_PASSWORD)
+    redis = await shared_redis()
 
     keys = []
     cur = b'0'  # set initial cursor to 0
 
     while cur:
-        cur, keys = await redis.scan(cur, match='fsm:*:*:data')
+        cur, keys = await redis.scan(cur,
+                                     match='fsm:*:*:data',
+                                     count=config.REDIS_SCAN_COUNT)
 
-        for key in keys:
-            val = await redis.get(key)
+        for val in await get_values(redis, keys):
             user_data: dict = json.loads(val)
             user_verified = user_data.get('verified', False)
 
             if user_verified:
                 yield user_data
 
-    redis.close()
-
 
 async def every(id_only=True):
-    redis = await aioredis.create_redis(
-        f'redis://{config.REDIS_HOST}:{config.REDIS_PORT}',
-        password=config.REDIS_PASSWORD)
+    redis = await shared_redis()
 
     keys = []
     cur = b'0'  # set initial cursor to 0
 
     while cur:
-        cur, keys = await redis.scan(cur, match='fsm:*:*:data')
+        cur, keys = await redis.scan(cur,
+                                     match='fsm:*:*:data',
+                                     count=config.REDIS_SCAN_COUNT)
 
-        for key in keys:
-            if id_only:
+        if id_only:
+            for key in keys:
                 id_data = str(key).split(':')
                 # chat_id = id_data[1]
                 user_id = id_data[2]
                 yield int(user_id)
-            else:
-                val = await redis.get(key)
+        else:
+            for val in await get_values(redis, keys):
                 user_data: dict = json.loads(val)
                 yield user_data
 
-    redis.close()
+
+async def get_values(redis, keys: list) -> list:
+    """
+    Values of the scanned keys with one round trip.
+    """
+    pipeline = redis.pipeline()
+    futures = [pipeline.get(key) for key in keys]
+    await pipeline.execute()
+
+    return [future.result() for future in futures
+            if future.result() is not None]